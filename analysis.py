@@ -0,0 +1,228 @@
+import re
+import json
+import jsonschema
+from metrics import track
+
+# Patterns used to pull structured results out of the analysis text
+SCORE_PATTERN = r"Compatibility Score[:\s]*([\d]{1,3})"
+STRENGTHS_HEADING = r"(?:Strengths|Top Strengths|Strength):"
+IMPROVEMENTS_HEADING = r"(?:Gaps|Improvements|Areas to Improve)"
+
+# Shape of the analysis requested in JSON mode
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "score": {"type": "number", "minimum": 0, "maximum": 100},
+        "summary": {"type": "string"},
+        "strengths": {"type": "array", "items": {"type": "string"}},
+        "gaps": {"type": "array", "items": {"type": "string"}},
+        "matched_keywords": {"type": "array", "items": {"type": "string"}},
+        "missing_keywords": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["score", "strengths", "gaps", "matched_keywords", "missing_keywords"],
+}
+ANALYSIS_VALIDATOR = jsonschema.Draft7Validator(ANALYSIS_SCHEMA)
+LIST_FIELDS = ("strengths", "gaps", "matched_keywords", "missing_keywords")
+
+
+class AnalysisFormatError(ValueError):
+    pass
+
+
+# Function to extract the compatibility score, or "N/A" when missing
+def parse_score(analysis_text):
+    score_match = re.search(SCORE_PATTERN, analysis_text, re.IGNORECASE)
+    return score_match.group(1) if score_match else "N/A"
+
+
+# Function to turn a section body into clean bullet points
+def clean_points(section_text):
+    points = [line.strip(" -•\n") for line in section_text.split('\n') if line.strip()]
+    points = [point.replace('•', '').strip() for point in points if point.strip() != "**"]
+    return [point for point in points if "Top 3" not in point and point != ""]
+
+
+# Function to extract the strengths list; only a closed section matches unless final
+def parse_strengths(analysis_text, final=True):
+    end = f"(?:{IMPROVEMENTS_HEADING}|$)" if final else IMPROVEMENTS_HEADING
+    strengths_match = re.search(
+        STRENGTHS_HEADING + r"([\s\S]*?)" + end, analysis_text, re.IGNORECASE
+    )
+    return clean_points(strengths_match.group(1)) if strengths_match else []
+
+
+# Function to extract the gaps/improvements list
+def parse_improvements(analysis_text):
+    improvements_match = re.search(
+        IMPROVEMENTS_HEADING + r":([\s\S]*)", analysis_text, re.IGNORECASE
+    )
+    return clean_points(improvements_match.group(1)) if improvements_match else []
+
+
+# Function to parse the score, strengths and improvements in one pass over the result
+def parse_analysis(analysis_text):
+    with track("parse_analysis", analysis_text):
+        return parse_score(analysis_text), parse_strengths(analysis_text), parse_improvements(analysis_text)
+
+
+# Function to build the analysis dict from fields parsed out of free-form text
+def analysis_from_fields(score, strengths, improvements, text=""):
+    return {
+        "score": int(score) if score and score.isdigit() else None,
+        "summary": "",
+        "strengths": strengths,
+        "gaps": improvements,
+        "matched_keywords": [],
+        "missing_keywords": [],
+        "text": text,
+    }
+
+
+# Function to convert a free-form text analysis into the analysis dict
+def analysis_from_text(analysis_text):
+    return analysis_from_fields(*parse_analysis(analysis_text), text=analysis_text)
+
+
+def _strip_code_fence(text):
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0]
+    return text
+
+
+# Function to parse and validate a JSON analysis into the analysis dict
+def parse_structured_analysis(analysis_text):
+    with track("parse_analysis_json", analysis_text):
+        try:
+            data = json.loads(_strip_code_fence(analysis_text))
+        except json.JSONDecodeError as e:
+            raise AnalysisFormatError(f"Analysis is not valid JSON: {e}") from e
+        error = next(ANALYSIS_VALIDATOR.iter_errors(data), None)
+        if error is not None:
+            raise AnalysisFormatError(f"Analysis does not match the schema: {error.message}")
+        analysis = {field: [item.strip() for item in data[field] if item.strip()] for field in LIST_FIELDS}
+        analysis["score"] = round(data["score"])
+        analysis["summary"] = data.get("summary", "").strip()
+        return analysis
+
+
+# Function to render the analysis dict as readable text (free-form results keep their text)
+def format_analysis(analysis):
+    if analysis.get("text"):
+        return analysis["text"]
+    score = analysis["score"] if analysis["score"] is not None else "N/A"
+    lines = [f"Compatibility Score: {score}/100", ""]
+    if analysis["summary"]:
+        lines += [analysis["summary"], ""]
+    lines += ["Strengths:"] + [f"- {point}" for point in analysis["strengths"]] + [""]
+    lines += ["Gaps:"] + [f"- {point}" for point in analysis["gaps"]] + [""]
+    if analysis["matched_keywords"]:
+        lines.append("Matched keywords: " + ", ".join(analysis["matched_keywords"]))
+    if analysis["missing_keywords"]:
+        lines.append("Missing keywords: " + ", ".join(analysis["missing_keywords"]))
+    return "\n".join(lines).strip()
+
+
+# Parses a streamed analysis, reporting each field as soon as it is complete
+class IncrementalAnalysisParser:
+    def __init__(self):
+        self._chunks = []
+        self.score = None
+        self.strengths = None
+        self.improvements = None
+        self.result = None
+
+    @property
+    def text(self):
+        return "".join(self._chunks)
+
+    def feed(self, chunk):
+        self._chunks.append(chunk)
+        updates = set()
+        if self.score is not None and self.strengths is not None:
+            return updates
+        text = self.text
+        if self.score is None:
+            # A score is complete once a non-digit follows it
+            score_match = re.search(SCORE_PATTERN + r"(?=\D)", text, re.IGNORECASE)
+            if score_match:
+                self.score = score_match.group(1)
+                updates.add("score")
+        if self.strengths is None:
+            if re.search(STRENGTHS_HEADING + r"[\s\S]*?" + IMPROVEMENTS_HEADING, text, re.IGNORECASE):
+                self.strengths = parse_strengths(text, final=False)
+                updates.add("strengths")
+        return updates
+
+    def close(self):
+        text = self.text
+        updates = set()
+        if self.score is None:
+            self.score = parse_score(text)
+            updates.add("score")
+        if self.strengths is None:
+            self.strengths = parse_strengths(text)
+            updates.add("strengths")
+        self.improvements = parse_improvements(text)
+        updates.add("improvements")
+        self.result = analysis_from_fields(self.score, self.strengths, self.improvements, text)
+        return updates
+
+
+# Parses a streamed JSON analysis, reporting each field once its value is complete
+class IncrementalJSONAnalysisParser:
+    def __init__(self):
+        self._chunks = []
+        self._decoder = json.JSONDecoder()
+        self.score = None
+        self.strengths = None
+        self.improvements = None
+        self.result = None
+
+    @property
+    def text(self):
+        return "".join(self._chunks)
+
+    # Function to decode a top-level field once its whole value has arrived, else None
+    def _field(self, text, name):
+        key = text.find(f'"{name}"')
+        colon = text.find(":", key + len(name) + 2) if key != -1 else -1
+        if colon == -1:
+            return None
+        start = colon + 1
+        while start < len(text) and text[start].isspace():
+            start += 1
+        try:
+            value, end = self._decoder.raw_decode(text, start)
+        except json.JSONDecodeError:
+            return None
+        # A number at the very end of the buffer may still be growing
+        return value if end < len(text) else None
+
+    def feed(self, chunk):
+        self._chunks.append(chunk)
+        updates = set()
+        if self.score is not None and self.strengths is not None and self.improvements is not None:
+            return updates
+        text = self.text
+        if self.score is None:
+            score = self._field(text, "score")
+            if isinstance(score, (int, float)):
+                self.score = round(score)
+                updates.add("score")
+        for field, attribute in (("strengths", "strengths"), ("gaps", "improvements")):
+            if getattr(self, attribute) is None:
+                points = self._field(text, field)
+                if isinstance(points, list):
+                    setattr(self, attribute, [str(point).strip() for point in points if str(point).strip()])
+                    updates.add(attribute)
+        return updates
+
+    # Validates the complete response; raises AnalysisFormatError if it is not usable
+    def close(self):
+        self.result = parse_structured_analysis(self.text)
+        self.score = self.result["score"]
+        self.strengths = self.result["strengths"]
+        self.improvements = self.result["gaps"]
+        return {"score", "strengths", "improvements"}
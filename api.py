@@ -0,0 +1,312 @@
+import os
+import json
+import asyncio
+import argparse
+from contextlib import asynccontextmanager
+from starlette.applications import Starlette
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from starlette.datastructures import UploadFile
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+from analysis import AnalysisFormatError
+from docx_export import create_word_resume
+from engine import (
+    get_analysis, stream_analysis, new_analysis_parser, finish_analysis, call_gemini_enhance_resume,
+    stream_gemini_enhance_resume
+)
+from extraction import ExtractionError, MAX_UPLOAD_BYTES, PDF_TYPE, extract_cached
+from metrics import metrics
+from providers import registry
+from resilience import AllProvidersFailedError, CircuitOpenError, RateLimitedError
+
+# Headless HTTP API over the same engine the Streamlit app uses, for programmatic
+# callers such as an ATS. Run several worker processes to scale out:
+#   uvicorn api:app --host 0.0.0.0 --port 8000 --workers 4
+
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+# Concurrent requests per worker process that call an LLM (analyze, enhance)
+API_LLM_CONCURRENCY = int(os.getenv("API_LLM_CONCURRENCY", "8"))
+# Concurrent CPU-bound requests per worker process (extract, export)
+API_CPU_CONCURRENCY = int(os.getenv("API_CPU_CONCURRENCY", str(os.cpu_count() or 2)))
+# How long a request waits for a free slot before it gets a 503
+API_QUEUE_TIMEOUT = float(os.getenv("API_QUEUE_TIMEOUT", "30"))
+# A JSON or multipart body can carry both a resume and a JD
+API_MAX_BODY_BYTES = int(os.getenv("API_MAX_BODY_BYTES", str(2 * MAX_UPLOAD_BYTES + 64 * 1024)))
+
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+NDJSON_TYPE = "application/x-ndjson"
+
+
+class ApiError(Exception):
+    def __init__(self, status_code, message, headers=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.headers = headers
+
+
+# Caps how many requests of one kind run at once; the rest wait up to API_QUEUE_TIMEOUT
+class ConcurrencyLimit:
+    def __init__(self, name, limit, timeout=API_QUEUE_TIMEOUT):
+        self.name = name
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def acquire(self):
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise ApiError(503, f"Too many concurrent {self.name} requests; try again shortly.",
+                           {"Retry-After": str(max(1, int(self.timeout)))})
+
+    def release(self):
+        self._semaphore.release()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+
+llm_limit = ConcurrencyLimit("LLM", API_LLM_CONCURRENCY)
+cpu_limit = ConcurrencyLimit("CPU", API_CPU_CONCURRENCY)
+
+
+def _upload_type(upload):
+    content_type = (upload.content_type or "").split(";")[0].strip()
+    if content_type == PDF_TYPE or (upload.filename or "").lower().endswith(".pdf"):
+        return PDF_TYPE
+    return "text/plain"
+
+
+async def _extract_upload(upload):
+    data = await upload.read()
+    async with cpu_limit:
+        return await run_in_threadpool(extract_cached, data, _upload_type(upload))
+
+
+# Function to read request fields from a JSON body, or from a multipart form where
+# file fields (e.g. resume, jd) are extracted to text
+async def read_fields(request):
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        fields = {}
+        async with request.form() as form:
+            for name, value in form.multi_items():
+                fields[name] = await _extract_upload(value) if isinstance(value, UploadFile) else value
+        return fields
+
+    try:
+        fields = json.loads(await request.body() or b"{}")
+    except ValueError:
+        raise ApiError(400, "Request body must be JSON or multipart/form-data.")
+    if not isinstance(fields, dict):
+        raise ApiError(400, "Request body must be a JSON object.")
+    return fields
+
+
+def _resume_and_jd(fields):
+    resume_text = fields.get("resume_text") or fields.get("resume")
+    jd_text = fields.get("jd_text") or fields.get("jd")
+    if not isinstance(resume_text, str) or not resume_text.strip():
+        raise ApiError(400, "resume_text (or a resume file) is required.")
+    if not isinstance(jd_text, str) or not jd_text.strip():
+        raise ApiError(400, "jd_text (or a jd file) is required.")
+    return resume_text, jd_text
+
+
+def _wants_stream(request):
+    return request.query_params.get("stream", "").lower() in ("1", "true", "yes")
+
+
+def _ndjson(event):
+    return json.dumps(event) + "\n"
+
+
+# Streaming response that gives back its concurrency slot once sent, even if the
+# client disconnects before the body starts
+class LimitedStreamingResponse(StreamingResponse):
+    def __init__(self, content, limit, **kwargs):
+        super().__init__(content, **kwargs)
+        self.limit = limit
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.limit.release()
+
+
+# Function to stream a blocking generator as NDJSON events, ending with the result
+# (or an error event, since the status code has already been sent)
+async def stream_events(chunks, result_event):
+    async def body():
+        try:
+            async for chunk in iterate_in_threadpool(chunks):
+                if chunk:
+                    yield _ndjson({"type": "chunk", "text": chunk})
+            yield _ndjson(await run_in_threadpool(result_event))
+        except Exception as e:
+            yield _ndjson({"type": "error", "error": f"{type(e).__name__}: {e}"})
+
+    await llm_limit.acquire()
+    return LimitedStreamingResponse(body(), llm_limit, media_type=NDJSON_TYPE)
+
+
+async def health(request):
+    return JSONResponse({"status": "ok"})
+
+
+async def metrics_endpoint(request):
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+# POST /v1/extract: a multipart "file" field, or the raw file as the body
+async def extract(request):
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        async with request.form() as form:
+            upload = form.get("file")
+            if not isinstance(upload, UploadFile):
+                raise ApiError(400, "Send the document in a multipart field named 'file'.")
+            text = await _extract_upload(upload)
+    else:
+        data = await request.body()
+        if not data:
+            raise ApiError(400, "Send a PDF or UTF-8 text document as the request body.")
+        content_type = request.headers.get("content-type", "").split(";")[0].strip()
+        file_type = PDF_TYPE if content_type == PDF_TYPE else "text/plain"
+        async with cpu_limit:
+            text = await run_in_threadpool(extract_cached, data, file_type)
+    return JSONResponse({"text": text, "chars": len(text)})
+
+
+# POST /v1/analyze: resume and JD as text or files; ?stream=true streams NDJSON events
+async def analyze(request):
+    resume_text, jd_text = _resume_and_jd(await read_fields(request))
+    if not _wants_stream(request):
+        async with llm_limit:
+            analysis = await run_in_threadpool(get_analysis, resume_text, jd_text)
+        return JSONResponse(analysis)
+
+    parser = new_analysis_parser()
+
+    def chunks():
+        for chunk in stream_analysis(resume_text, jd_text):
+            parser.feed(chunk)
+            yield chunk
+
+    def result_event():
+        return {"type": "result", "analysis": finish_analysis(parser, resume_text, jd_text)}
+
+    return await stream_events(chunks(), result_event)
+
+
+async def _reference_text(fields, resume_text, jd_text):
+    collection_name = fields.get("reference_collection")
+    if not collection_name:
+        return "N/A"
+    # Imported on demand so workers that never use references skip opening Chroma
+    from retrieval import retrieve_reference_text
+    try:
+        return await run_in_threadpool(retrieve_reference_text, collection_name, jd_text, resume_text)
+    except Exception as e:
+        raise ApiError(400, f"Could not retrieve reference material: {e}")
+
+
+# POST /v1/enhance: returns the enhanced resume markdown; ?stream=true streams NDJSON events
+async def enhance(request):
+    fields = await read_fields(request)
+    resume_text, jd_text = _resume_and_jd(fields)
+    reference_text = await _reference_text(fields, resume_text, jd_text)
+    if not _wants_stream(request):
+        async with llm_limit:
+            enhanced = await run_in_threadpool(
+                call_gemini_enhance_resume, resume_text, jd_text, reference_text
+            )
+        return JSONResponse({"enhanced_resume": enhanced})
+
+    parts = []
+
+    def chunks():
+        for chunk in stream_gemini_enhance_resume(resume_text, jd_text, reference_text):
+            parts.append(chunk)
+            yield chunk
+
+    return await stream_events(chunks(), lambda: {"type": "result", "enhanced_resume": "".join(parts)})
+
+
+# POST /v1/export: enhanced resume markdown (JSON "markdown" field or a text body) to DOCX
+async def export(request):
+    if request.headers.get("content-type", "").startswith("application/json"):
+        markdown_text = (await read_fields(request)).get("markdown")
+    else:
+        markdown_text = (await request.body()).decode("utf-8", errors="replace")
+    if not isinstance(markdown_text, str) or not markdown_text.strip():
+        raise ApiError(400, "markdown is required.")
+    async with cpu_limit:
+        data = await run_in_threadpool(create_word_resume, markdown_text)
+    return Response(data, media_type=DOCX_TYPE,
+                    headers={"Content-Disposition": 'attachment; filename="enhanced_resume.docx"'})
+
+
+async def api_error(request, exc):
+    return JSONResponse({"error": exc.message}, status_code=exc.status_code, headers=exc.headers)
+
+
+async def client_error(request, exc):
+    return JSONResponse({"error": str(exc)}, status_code=400)
+
+
+async def provider_error(request, exc):
+    return JSONResponse({"error": f"{type(exc).__name__}: {exc}"}, status_code=502)
+
+
+async def provider_busy(request, exc):
+    return JSONResponse({"error": str(exc)}, status_code=503, headers={"Retry-After": "5"})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Provider clients are created once per worker process
+    await run_in_threadpool(registry.warm_up)
+    yield
+
+
+app = Starlette(
+    routes=[
+        Route("/health", health),
+        Route("/metrics", metrics_endpoint),
+        Route("/v1/extract", extract, methods=["POST"]),
+        Route("/v1/analyze", analyze, methods=["POST"]),
+        Route("/v1/enhance", enhance, methods=["POST"]),
+        Route("/v1/export", export, methods=["POST"]),
+    ],
+    exception_handlers={
+        ApiError: api_error,
+        ExtractionError: client_error,
+        AnalysisFormatError: provider_error,
+        AllProvidersFailedError: provider_error,
+        RateLimitedError: provider_busy,
+        CircuitOpenError: provider_busy,
+    },
+    lifespan=lifespan,
+    max_body_size=API_MAX_BODY_BYTES,
+)
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the resume engine over HTTP.")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes")
+    args = parser.parse_args(argv)
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,27 @@
 import streamlit as st
-import tempfile
-import os
-import fitz
-from docx import Document
-from groq import Groq
-import google.generativeai as genai
-from dotenv import load_dotenv
-from markdown import markdown
-from bs4 import BeautifulSoup
-import re
-
-# Load environment variables from .env file
-load_dotenv()
-
-# Initialize Groq client
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-client = Groq(api_key=GROQ_API_KEY)
-
-# Initialize Gemini
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_API_KEY)
+from analysis import format_analysis
+from extraction import extract_text, ExtractionError
+from engine import compact_inputs, list_sections, reenhance_sections, ANALYSIS_PROVIDERS
+from jobs import (
+    job_store, start_job_workers, submit_analysis, submit_enhancement, submit_export, ACTIVE_STATUSES,
+    JOB_POLL_SECONDS
+)
+from providers import registry
+from metrics import start_metrics_server
+from ats_score import ats_score
+from retrieval import list_collection_names
+from batch_screen import extract_uploads, screen_resumes, rank_results, results_to_csv
+
+# Process-level setup runs only when Streamlit executes this script (as __main__); a
+# process that merely imports it, such as a spawned child running it as __mp_main__,
+# must not start a second metrics server or worker pool
+if __name__ == "__main__":
+    # Provider clients are created once per process and reused across reruns
+    registry.warm_up()
+    # Serve /metrics for this process (METRICS_PORT=0 turns it off)
+    start_metrics_server()
+    # Analysis, enhancement and export run as durable jobs in worker processes
+    start_job_workers()
 
 # Set theme to light
 st.set_page_config(
@@ -290,136 +292,216 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Session state
-for key in ["resume_text", "jd_text", "enhanced_resume", "analysis_result", "enhanced_resume_text"]:
+for key in ["resume_text", "jd_text", "enhanced_resume", "analysis_result", "enhanced_resume_text",
+            "batch_results", "analysis_job_id", "enhance_job_id", "export_job_id", "analysis_error",
+            "enhance_error", "export_error"]:
     if key not in st.session_state:
         st.session_state[key] = None
+# Bumped whenever new enhanced text is generated, so the editor starts from it
+if "enhanced_resume_version" not in st.session_state:
+    st.session_state.enhanced_resume_version = 0
 
 # -------- Functions --------
 
-def extract_text(uploaded_file):
-    if uploaded_file.type == "application/pdf":
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            tmp.write(uploaded_file.read())
-            tmp_path = tmp.name
-        doc = fitz.open(tmp_path)
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        doc.close()
-        return text
+def render_strengths(strengths):
+    st.subheader("✅ Strengths")
+    for point in strengths:
+        st.success(point)
+
+def render_improvements(improvements):
+    st.subheader("🔄 Areas to Improve")
+    for point in improvements:
+        st.warning(point)
+
+# The analysis is a dict (see analysis.py), so rendering is plain lookups
+def render_analysis(analysis, score_slot=None):
+    score = analysis["score"] if analysis["score"] is not None else "N/A"
+    (score_slot or st).metric("Compatibility Score", f"{score}/100")
+    if analysis["summary"]:
+        st.write(analysis["summary"])
+
+    col1, col2 = st.columns(2)
+
+    # Strengths
+    if analysis["strengths"]:
+        with col1:
+            render_strengths(analysis["strengths"])
+
+    # Areas to Improve
+    if analysis["gaps"]:
+        with col2:
+            render_improvements(analysis["gaps"])
+
+    if analysis["missing_keywords"]:
+        st.caption("Keywords to add: " + ", ".join(analysis["missing_keywords"]))
+
+# Polls the analysis job, showing the fields parsed so far; reruns the page when it ends
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_analysis_job():
+    job = job_store.get(st.session_state.analysis_job_id)
+    if job is not None and job["status"] in ACTIVE_STATUSES:
+        st.progress(job["progress"], text=job["message"])
+        partial = job["partial"] or {}
+        if partial.get("score") is not None:
+            st.metric("Compatibility Score", f"{partial['score']}/100")
+        col1, col2 = st.columns(2)
+        if partial.get("strengths"):
+            with col1:
+                render_strengths(partial["strengths"])
+        if partial.get("improvements"):
+            with col2:
+                render_improvements(partial["improvements"])
+        return
+
+    st.session_state.analysis_job_id = None
+    if job is None:
+        st.session_state.analysis_error = "The analysis job was not found."
+    elif job["status"] == "done":
+        st.session_state.analysis_result = job["result"]
+    else:
+        st.session_state.analysis_error = job["error"]
+    st.rerun()
+
+# Polls the enhancement job, previewing the text so far; reruns the page when it ends
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_enhance_job():
+    job = job_store.get(st.session_state.enhance_job_id)
+    if job is not None and job["status"] in ACTIVE_STATUSES:
+        st.progress(job["progress"], text=job["message"])
+        partial = job["partial"] or {}
+        if partial.get("text"):
+            st.subheader("📄 Enhanced Resume Preview")
+            st.markdown(partial["text"] + "▌")
+        return
+
+    st.session_state.enhance_job_id = None
+    if job is None:
+        st.session_state.enhance_error = "The enhancement job was not found."
+    elif job["status"] == "done":
+        st.session_state.enhanced_resume_text = job["result"]["enhanced_resume"]
+        st.session_state.enhanced_resume = job["result_blob"]
+        st.session_state.enhanced_resume_version += 1
+        st.toast("✨ Resume enhancement completed!")
     else:
-        return uploaded_file.read().decode('utf-8')
+        st.session_state.enhance_error = job["error"]
+    st.rerun()
+
+# Polls the DOCX export job; reruns the page when it ends
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_export_job():
+    job = job_store.get(st.session_state.export_job_id)
+    if job is not None and job["status"] in ACTIVE_STATUSES:
+        st.progress(job["progress"], text="Building DOCX")
+        return
+
+    st.session_state.export_job_id = None
+    if job is None:
+        st.session_state.export_error = "The export job was not found."
+    elif job["status"] == "done":
+        st.session_state.enhanced_resume = job["result_blob"]
+    else:
+        st.session_state.export_error = job["error"]
+    st.rerun()
+
+# Function to queue an analysis job; identical in-flight inputs share one job
+def start_analysis_job():
+    st.session_state.analysis_result = None
+    st.session_state.analysis_error = None
+    st.session_state.analysis_job_id = submit_analysis(
+        st.session_state.resume_text, st.session_state.jd_text
+    )
+
+def start_enhance_job(reference_collection):
+    st.session_state.enhance_error = None
+    st.session_state.enhance_job_id = submit_enhancement(
+        st.session_state.resume_text, st.session_state.jd_text, reference_collection
+    )
+
+# Function to rebuild the DOCX for new enhanced text in a worker; the download waits for it
+def start_export_job(enhanced_resume_text):
+    st.session_state.enhanced_resume = None
+    st.session_state.export_error = None
+    st.session_state.export_job_id = submit_export(enhanced_resume_text)
+
+def render_batch_screening():
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("<h3>📋 Upload Job Description</h3>", unsafe_allow_html=True)
+        jd_file = st.file_uploader("Upload Job Description", type=["pdf", "txt"], key="batch_jd_uploader")
+    with col2:
+        st.markdown("<h3>📄 Upload Resumes</h3>", unsafe_allow_html=True)
+        resume_files = st.file_uploader(
+            "Upload Resumes", type=["pdf", "txt"], accept_multiple_files=True, key="batch_resume_uploader"
+        )
+
+    if not (jd_file and resume_files):
+        return
 
-def call_groq_llama(system_prompt, user_prompt):
     try:
-        response = client.chat.completions.create(
-            model="llama3-70b-8192",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.3
+        jd_text = extract_text(jd_file)
+    except ExtractionError as e:
+        st.error(f"Error reading uploaded file: {e}")
+        return
+
+    st.markdown("<h3>🏆 Screen Resumes</h3>", unsafe_allow_html=True)
+
+    top_k = st.number_input(
+        "Only send the top K resumes by ATS keyword match to the LLM (0 = all)",
+        min_value=0, max_value=len(resume_files), value=0, step=1
+    )
+
+    if st.button(f"Screen {len(resume_files)} Resumes"):
+        st.session_state.batch_results = None
+        uploads = [(file.name, file.getvalue(), file.type) for file in resume_files]
+
+        # Re-rank the table as each scored resume arrives
+        live_results = st.empty()
+        with live_results.container():
+            progress = st.progress(0.0)
+            table = st.empty()
+
+        rows = []
+        for row in screen_resumes(extract_uploads(uploads), jd_text, top_k=top_k or None):
+            rows.append(row)
+            progress.progress(len(rows) / len(uploads), text=f"Screened {len(rows)} of {len(uploads)}")
+            table.dataframe(rank_results(rows), use_container_width=True)
+
+        live_results.empty()
+        st.session_state.batch_results = rank_results(rows)
+
+    if st.session_state.batch_results:
+        st.dataframe(st.session_state.batch_results, use_container_width=True)
+        st.download_button(
+            label="📥 Download Results (CSV)",
+            data=results_to_csv(st.session_state.batch_results),
+            file_name="screening_results.csv",
+            mime="text/csv"
         )
-        return response.choices[0].message.content
-    except Exception as e:
-        st.error(f"Error calling Groq API: {e}")
-        return None
-
-def analyze_resume(resume_text, jd_text):
-    prompt = f"""
-You are an expert recruiter and career consultant.
-
-Given a candidate's resume and a job description (JD):
-- Assess how well the resume aligns with the JD.
-- Give a *Compatibility Score out of 100*.
-- Highlight *Top 3-5 Strengths* where the resume matches the JD.
-- Point out *Top 3-5 Gaps or Improvements* needed to better align with the JD.
-- Be detailed, specific, and professional.
-- Focus on skills, experiences, certifications, technical expertise, and ATS keywords.
-- Avoid generic statements; back your points with resume or JD references.
-
-Resume:
-{resume_text}
-
-Job Description:
-{jd_text}
-"""
-    return call_groq_llama("You are an expert recruiter analyzing resumes.", prompt)
-
-def create_word_resume(enhanced_resume_text):
-    html_content = markdown(enhanced_resume_text)
-    soup = BeautifulSoup(html_content, "html.parser")
-
-    doc = Document()
-
-    def add_formatted_paragraph(element, style=None):
-        para = doc.add_paragraph(style=style)
-        for child in element.children:
-            if child.name == "strong":
-                run = para.add_run(child.get_text())
-                run.bold = True
-            elif child.name == "em":
-                run = para.add_run(child.get_text())
-                run.italic = True
-            elif child.name is None:  
-                run = para.add_run(child)
-            else:
-                run = para.add_run(child.get_text()) 
-        return para
-
-    for element in soup.find_all(["h1", "h2", "h3", "p", "ul", "ol"]):
-        if element.name == "h1":
-            add_formatted_paragraph(element, style="Heading 1")
-        elif element.name == "h2":
-            add_formatted_paragraph(element, style="Heading 2")
-        elif element.name == "h3":
-            add_formatted_paragraph(element, style="Heading 3")
-        elif element.name == "p":
-            add_formatted_paragraph(element)
-        elif element.name in ["ul", "ol"]:
-            for li in element.find_all("li"):
-                para = doc.add_paragraph(style="List Bullet")
-                for child in li.children:
-                    if child.name == "strong":
-                        run = para.add_run(child.get_text())
-                        run.bold = True
-                    elif child.name == "em":
-                        run = para.add_run(child.get_text())
-                        run.italic = True
-                    elif child.name is None:
-                        para.add_run(child)
-
-    save_path = "Enhanced_Resume.docx"
-    doc.save(save_path)
-    return save_path
-
-def call_gemini_enhance_resume(resume_text, jd_text, reference_text):
-    model = genai.GenerativeModel('gemini-1.5-pro')
-    prompt = f"""
-You are a professional resume writer and career coach specialized in ATS optimization.
-
-Given a candidate's resume, a job description, and some additional material:
-- Rewrite and enhance the resume to maximize compatibility.
-- Incorporate missing important skills, tools, certifications, and responsibilities.
-- Improve phrasing to be professional, quantifiable, and impact-driven.
-- Ensure ATS-friendliness.
-
-Resume:
-{resume_text}
-
-Job Description:
-{jd_text}
-
-Reference Material:
-{reference_text}
-
-Return ONLY the enhanced full resume, no extra explanations. Send in markdown strictly.
-"""
-    response = model.generate_content(prompt)
-    return response.text
 
 # -------------------- UI --------------------
 
+# Mode selection
+mode = st.sidebar.radio("Mode", ["Single Resume", "Batch Screening"])
+if mode == "Batch Screening":
+    render_batch_screening()
+    st.stop()
+
+# Reference material for enhancement comes from a ChromaDB collection
+try:
+    collection_names = list_collection_names()
+except Exception as e:
+    st.sidebar.warning(f"Reference collections unavailable: {e}")
+    collection_names = []
+reference_choice = st.sidebar.selectbox("Reference Collection", ["None"] + collection_names)
+reference_collection = None if reference_choice == "None" else reference_choice
+
+if st.sidebar.button("Check Providers"):
+    for provider, status in registry.health().items():
+        if status["ok"]:
+            st.sidebar.success(f"{provider}: OK ({status['latency_ms']} ms)")
+        else:
+            st.sidebar.error(f"{provider}: {status['error']}")
+
 # File Upload Section
 col1, col2 = st.columns(2)
 
@@ -432,75 +514,62 @@ with col2:
 
 # Process uploaded files
 if resume_file and jd_file:
-    st.session_state.resume_text = extract_text(resume_file)
-    st.session_state.jd_text = extract_text(jd_file)
-    
+    try:
+        st.session_state.resume_text = extract_text(resume_file)
+        st.session_state.jd_text = extract_text(jd_file)
+    except ExtractionError as e:
+        st.error(f"Error reading uploaded file: {e}")
+        st.stop()
+
+    # Combined Section: run the Groq analysis and Gemini enhancement concurrently
+    st.markdown("<h3>⚡ Analyze and Enhance</h3>", unsafe_allow_html=True)
+
+    # Both jobs run in the background; their progress shows in the sections below
+    if st.button("Analyze + Enhance"):
+        st.session_state.enhanced_resume_text = None
+        st.session_state.enhanced_resume = None
+        start_analysis_job()
+        start_enhance_job(reference_collection)
+
     # Analysis Section
     st.markdown("<h3>🔍 Analyze Compatibility</h3>", unsafe_allow_html=True)
-    
-    if st.button("Start Analysis"):
-        with st.spinner("Analyzing your resume..."):
-            analysis_result = analyze_resume(
-                st.session_state.resume_text, st.session_state.jd_text
-            )
-            st.session_state.analysis_result = analysis_result
 
-    if st.session_state.analysis_result:
-        analysis_result = st.session_state.analysis_result
-        
-        # Updated score extraction!
-        score_match = re.search(r"Compatibility Score[:\s]*([\d]{1,3})", analysis_result, re.IGNORECASE)
-        score = score_match.group(1) if score_match else "N/A"
-
-        st.metric("Compatibility Score", f"{score}/100")
-
-        strengths = []
-        improvements = []
-        strengths_match = re.search(
-            r"(?:Strengths|Top Strengths|Strength):([\s\S]*?)(?:Gaps|Improvements|Areas to Improve|$)", 
-            analysis_result, re.IGNORECASE
-        )
-        improvements_match = re.search(
-            r"(?:Gaps|Improvements|Areas to Improve):([\s\S]*)", 
-            analysis_result, re.IGNORECASE
-        )
-        
-        if strengths_match:
-            strengths = [line.strip(" -•\n") for line in strengths_match.group(1).split('\n') if line.strip()]
-        if improvements_match:
-            improvements = [line.strip(" -•\n") for line in improvements_match.group(1).split('\n') if line.strip()]
+    # Local keyword pre-score, shown before (and next to) the LLM score
+    ats = ats_score(st.session_state.resume_text, st.session_state.jd_text)
+    metric_col1, metric_col2 = st.columns(2)
+    with metric_col1:
+        st.metric("ATS Keyword Match", f"{ats['score']}/100")
+        if ats["missing"]:
+            st.caption("Missing keywords: " + ", ".join(ats["missing"][:15]))
+    llm_score_slot = metric_col2.empty()
+
+    # Cleaned and trimmed input size sent to the primary analysis model
+    _, _, token_report = compact_inputs(
+        st.session_state.resume_text, st.session_state.jd_text, ANALYSIS_PROVIDERS[:1]
+    )
+    st.caption(
+        f"Prompt input: resume {token_report['resume_tokens_before']:,} → "
+        f"{token_report['resume_tokens_after']:,} tokens, JD {token_report['jd_tokens_before']:,} → "
+        f"{token_report['jd_tokens_after']:,} tokens (budget {token_report['budget']:,})"
+    )
 
-        strengths = [point for point in strengths if point.strip() != "**"]
-        improvements = [point for point in improvements if point.strip() != "**"]
-
-        col1, col2 = st.columns(2)
+    if st.button("Start Analysis"):
+        start_analysis_job()
 
-        # Strengths
-        if strengths:
-            with col1:
-                st.subheader("✅ Strengths")
-                for point in strengths:
-                    clean_point = point.replace('•', '').strip()
-                    clean_point = re.sub(r'\*\*(.*?)\*\*', r'**\1**', clean_point)
-                    if "Top 3" not in clean_point and clean_point != "":
-                        st.success(clean_point)
-
-        # Areas to Improve
-        if improvements:
-            with col2:
-                st.subheader("🔄 Areas to Improve")
-                for point in improvements:
-                    clean_point = point.replace('•', '').strip()
-                    clean_point = re.sub(r'\*\*(.*?)\*\*', r'**\1**', clean_point)
-                    if "Top 3" not in clean_point and clean_point != "":
-                        st.warning(clean_point)
+    if st.session_state.analysis_job_id:
+        show_analysis_job()
+    if st.session_state.analysis_error:
+        st.error(f"Error during analysis: {st.session_state.analysis_error}")
 
+    if st.session_state.analysis_result:
+        analysis_result = st.session_state.analysis_result
+        render_analysis(analysis_result, llm_score_slot)
 
         # Full Analysis Text
         with st.expander("📋 View Full Analysis"):
             st.text_area(
                 label="Analysis Results",
-                value=analysis_result,
+                value=format_analysis(analysis_result),
                 height=300,
                 key="analysis_text_area"
             )
@@ -509,34 +578,67 @@ if resume_file and jd_file:
     st.markdown("<h3>✨ Enhance Resume</h3>", unsafe_allow_html=True)
     
     if st.button("Generate Enhanced Resume"):
-        with st.spinner("Enhancing your resume..."):
-            reference_text = "N/A"  # You can add your own reference material here
-            enhanced_resume_text = call_gemini_enhance_resume(
-                st.session_state.resume_text,
-                st.session_state.jd_text,
-                reference_text
-            )
-            st.session_state.enhanced_resume_text = enhanced_resume_text
+        start_enhance_job(reference_collection)
 
-            if enhanced_resume_text:
-                enhanced_resume_path = create_word_resume(enhanced_resume_text)
-                st.session_state.enhanced_resume = enhanced_resume_path
-                st.success("✨ Resume enhancement completed!")
+    if st.session_state.enhance_job_id:
+        show_enhance_job()
+    if st.session_state.enhance_error:
+        st.error(f"Error during enhancement: {st.session_state.enhance_error}")
 
-    if st.session_state.enhanced_resume_text and st.session_state.enhanced_resume:
+    if st.session_state.enhanced_resume_text:
         st.subheader("📄 Enhanced Resume Preview")
+
+        # Redo only the chosen sections; unchanged requests are served from the section cache
+        with st.expander("🔁 Regenerate Sections"):
+            section_titles = dict(list_sections(st.session_state.enhanced_resume_text))
+            selected_sections = st.multiselect(
+                "Sections to regenerate",
+                options=list(section_titles),
+                format_func=lambda index: section_titles[index]
+            )
+            section_instruction = st.text_input(
+                "Instructions (optional)", placeholder="e.g. emphasize leadership and cloud experience"
+            )
+            if st.button("Regenerate Selected Sections", disabled=not selected_sections):
+                with st.spinner("Regenerating sections..."):
+                    try:
+                        enhanced_resume_text, section_stats = reenhance_sections(
+                            st.session_state.enhanced_resume_text,
+                            st.session_state.jd_text,
+                            selected_sections,
+                            section_instruction.strip()
+                        )
+                    except Exception as e:
+                        st.error(f"Error during enhancement: {e}")
+                    else:
+                        st.session_state.enhanced_resume_text = enhanced_resume_text
+                        st.session_state.enhanced_resume_version += 1
+                        start_export_job(enhanced_resume_text)
+                        st.success(
+                            f"Regenerated {section_stats['sent']} section(s), "
+                            f"{section_stats['cached']} from cache; {section_stats['kept']} kept as is."
+                        )
+
         with st.expander("Show Enhanced Resume"):
-            st.text_area(
-                label="Enhanced Resume Content",
+            edited_resume_text = st.text_area(
+                label="Enhanced Resume Content (edits are included in the DOCX)",
                 value=st.session_state.enhanced_resume_text,
                 height=400,
-                key="enhanced_resume_text_area"
+                key=f"enhanced_resume_text_area_{st.session_state.enhanced_resume_version}"
             )
-
-        with open(st.session_state.enhanced_resume, "rb") as file:
+            # Only the edited sections are re-rendered when the DOCX is rebuilt
+            if edited_resume_text.strip() and edited_resume_text != st.session_state.enhanced_resume_text:
+                st.session_state.enhanced_resume_text = edited_resume_text
+                start_export_job(edited_resume_text)
+
+        if st.session_state.export_job_id:
+            show_export_job()
+        if st.session_state.export_error:
+            st.error(f"Error building the DOCX: {st.session_state.export_error}")
+        if st.session_state.enhanced_resume:
             st.download_button(
                 label="📥 Download Enhanced Resume (DOCX)",
-                data=file,
+                data=st.session_state.enhanced_resume,
                 file_name="enhanced_resume.docx",
                 mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
             )
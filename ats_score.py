@@ -0,0 +1,83 @@
+import re
+import math
+from collections import Counter
+
+# Deterministic keyword-overlap scorer that runs locally before any LLM call
+
+# Keeps terms like c++, c#, node.js, ci/cd and scikit-learn as single tokens
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#./\-]*[a-z0-9+#]|[a-z0-9]")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each etc few for from further
+had has have having he her here hers herself him himself his how i if in into is it its itself
+just me more most my myself no nor not now of off on once only or other our ours ourselves out
+over own same she should so some such than that the their theirs them themselves then there these
+they this those through to too under until up very was we were what when where which while who
+whom why will with would you your yours yourself yourselves
+ability able across candidate candidates company including job looking must new per plus
+preferred required requirements responsibilities responsible role strong team teams using well
+work working within year years experience excellent good skills knowledge understanding
+""".split())
+
+# BM25 saturation parameters; AVERAGE_DOC_TOKENS approximates a one-to-two page resume
+BM25_K1 = 1.2
+BM25_B = 0.75
+AVERAGE_DOC_TOKENS = 600
+MAX_KEYWORDS = 40
+
+
+# Function to split text into lowercase tokens without stopwords
+def tokenize(text):
+    tokens = TOKEN_PATTERN.findall((text or "").lower())
+    return [token for token in tokens
+            if token not in STOPWORDS and any(char.isalpha() for char in token)]
+
+
+# Function to count unigrams plus adjacent-token bigrams
+def count_terms(tokens):
+    counts = Counter(tokens)
+    counts.update(f"{first} {second}" for first, second in zip(tokens, tokens[1:]))
+    return counts
+
+
+# Function to pick the JD's most important terms with a weight for each
+def extract_keywords(jd_text, limit=MAX_KEYWORDS):
+    tokens = tokenize(jd_text)
+    counts = count_terms(tokens)
+    weights = {}
+    for term, count in counts.items():
+        is_bigram = " " in term
+        # A phrase seen once is usually incidental; repeated phrases are real skills
+        if is_bigram and count < 2:
+            continue
+        weights[term] = (1 + math.log(count)) * (1.5 if is_bigram else 1.0)
+    ranked = sorted(weights.items(), key=lambda item: (-item[1], item[0]))
+    return dict(ranked[:limit])
+
+
+# Function to score how well a resume covers the JD keywords, from 0 to 100
+def ats_score(resume_text, jd_text, keywords=None):
+    if keywords is None:
+        keywords = extract_keywords(jd_text)
+    if not keywords:
+        return {"score": 0, "matched": [], "missing": []}
+
+    resume_tokens = tokenize(resume_text)
+    resume_counts = count_terms(resume_tokens)
+    length_norm = 1 - BM25_B + BM25_B * len(resume_tokens) / AVERAGE_DOC_TOKENS
+
+    total = 0.0
+    matched = []
+    missing = []
+    for term, weight in keywords.items():
+        tf = resume_counts.get(term, 0)
+        if tf:
+            matched.append(term)
+            # BM25 term saturation scaled to 0..1
+            total += weight * (tf * (BM25_K1 + 1) / (tf + BM25_K1 * length_norm)) / (BM25_K1 + 1)
+        else:
+            missing.append(term)
+
+    score = round(100 * total / sum(keywords.values()))
+    return {"score": min(score, 100), "matched": matched, "missing": missing}
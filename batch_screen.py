@@ -0,0 +1,278 @@
+import os
+import io
+import csv
+import sys
+import time
+import queue
+import pickle
+import argparse
+import threading
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from ats_score import ats_score, extract_keywords
+from engine import get_analysis
+from extraction import extract_bytes, extract_path
+
+# Batch screening limits (override via environment)
+BATCH_EXTRACT_WORKERS = int(os.getenv("BATCH_EXTRACT_WORKERS", str(os.cpu_count() or 2)))
+BATCH_LLM_WORKERS = int(os.getenv("BATCH_LLM_WORKERS", "4"))
+BATCH_REQUESTS_PER_MINUTE = int(os.getenv("BATCH_REQUESTS_PER_MINUTE", "30"))
+# How long an extraction subprocess gets to stop its workers before it is killed
+EXTRACTION_SHUTDOWN_SECONDS = 30
+
+RESULT_FIELDS = ["file", "score", "ats_score", "strengths", "improvements", "error"]
+
+
+# Spaces out provider requests to stay under a requests-per-minute budget
+class RateLimiter:
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next_start = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+# Function to extract files in worker processes, yielding (name, text, error) as each finishes.
+# spawn avoids forking a threaded parent, but spawned workers re-run the parent's __main__
+# script, so only call this from a process whose __main__ is safe to re-run (not app.py).
+def _extract_in_processes(jobs, workers):
+    context = multiprocessing.get_context("spawn")
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    try:
+        futures = {executor.submit(fn, *args): name for name, fn, args in jobs}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, str(e)
+    finally:
+        # A consumer that stops early should not wait for files it will never read
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+# Function to extract (name, data, file_type) uploads in parallel. Under Streamlit, __main__
+# is app.py, so the pool runs in a `python batch_screen.py` subprocess (like the job
+# workers) that takes the uploads on stdin and sends results back over a pipe.
+def extract_uploads(uploads, workers=BATCH_EXTRACT_WORKERS):
+    read_fd, write_fd = os.pipe()
+    try:
+        process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--serve-extraction", str(write_fd),
+             "--extract-workers", str(workers)],
+            stdin=subprocess.PIPE, pass_fds=(write_fd,),
+        )
+    finally:
+        os.close(write_fd)
+    with os.fdopen(read_fd, "rb") as results:
+        try:
+            with process.stdin:
+                pickle.dump(list(uploads), process.stdin)
+            while True:
+                try:
+                    yield pickle.load(results)
+                except EOFError:
+                    break
+            if process.wait() != 0:
+                raise RuntimeError(f"Extraction subprocess exited with code {process.returncode}")
+        finally:
+            # Closing our end of the pipe makes the subprocess stop at its next result;
+            # it then shuts its workers down
+            results.close()
+            try:
+                process.wait(timeout=EXTRACTION_SHUTDOWN_SECONDS)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+
+# Function to serve extract_uploads() in the subprocess: uploads in on stdin, one pickled
+# (name, text, error) per file out on the result pipe
+def serve_extraction(result_fd, workers):
+    uploads = pickle.load(sys.stdin.buffer)
+    jobs = [(name, extract_bytes, (data, file_type)) for name, data, file_type in uploads]
+    extracted = _extract_in_processes(jobs, workers)
+    try:
+        with os.fdopen(result_fd, "wb") as results:
+            for result in extracted:
+                pickle.dump(result, results)
+                results.flush()
+    except BrokenPipeError:
+        # The app stopped reading (e.g. the session ended)
+        pass
+    finally:
+        extracted.close()
+
+
+# Function to extract files on disk in parallel
+def extract_files(paths, workers=BATCH_EXTRACT_WORKERS):
+    jobs = [(path, extract_path, (path,)) for path in paths]
+    return _extract_in_processes(jobs, workers)
+
+
+def _empty_row(name, error=""):
+    return {"file": name, "score": None, "ats_score": None, "strengths": "", "improvements": "",
+            "error": error or ""}
+
+
+# Function to analyze one resume and reduce the analysis to a result row
+def score_resume(name, resume_text, error, jd_text, limiter, keywords=None, call_llm=True):
+    row = _empty_row(name, error)
+    if error:
+        return row
+    row["ats_score"] = ats_score(resume_text, jd_text, keywords)["score"]
+    if not call_llm:
+        return row
+    try:
+        analysis = get_analysis(resume_text, jd_text, before_call=limiter.wait)
+    except Exception as e:
+        row["error"] = f"Error during analysis: {e}"
+        return row
+
+    row["score"] = analysis["score"]
+    row["strengths"] = "; ".join(analysis["strengths"])
+    row["improvements"] = "; ".join(analysis["gaps"])
+    return row
+
+
+# Function to pick the positions of the top_k resumes by local ATS score (positions,
+# not names, since two uploads can share a filename)
+def ats_shortlist(resumes, jd_text, keywords, top_k):
+    scored = [
+        (ats_score(resume_text, jd_text, keywords)["score"], name, i)
+        for i, (name, resume_text, error) in enumerate(resumes) if not error
+    ]
+    scored.sort(key=lambda item: (-item[0], item[1], item[2]))
+    return {i for _, _, i in scored[:top_k]}
+
+
+# Function to queue a finished resume's row, or an error row if scoring raised, so
+# the consumer always gets one row per submitted resume
+def _queue_row(results, name, future):
+    try:
+        results.put(future.result())
+    except Exception as e:
+        results.put(_empty_row(name, f"Error during screening: {e}"))
+
+
+# Function to score extracted resumes through a bounded pool, yielding rows as they complete.
+# With top_k, only the best resumes by local ATS score are sent to the LLM.
+def screen_resumes(resumes, jd_text, workers=BATCH_LLM_WORKERS,
+                   requests_per_minute=BATCH_REQUESTS_PER_MINUTE, top_k=None):
+    limiter = RateLimiter(requests_per_minute)
+    keywords = extract_keywords(jd_text)
+    shortlist = None
+    if top_k:
+        # The first stage needs every resume before it can choose the shortlist
+        resumes = list(resumes)
+        shortlist = ats_shortlist(resumes, jd_text, keywords, top_k)
+    results = queue.Queue()
+    pending = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Submit each resume as soon as its extraction finishes
+        for i, (name, resume_text, error) in enumerate(resumes):
+            call_llm = shortlist is None or i in shortlist
+            future = executor.submit(
+                score_resume, name, resume_text, error, jd_text, limiter, keywords, call_llm
+            )
+            future.add_done_callback(lambda done, name=name: _queue_row(results, name, done))
+            pending += 1
+            while not results.empty():
+                pending -= 1
+                yield results.get()
+        while pending:
+            pending -= 1
+            yield results.get()
+
+
+# Function to order rows by LLM score, then ATS score, with unscored rows last
+def rank_results(rows):
+    return sorted(rows, key=lambda row: (
+        row["score"] is None, -(row["score"] or 0), -(row["ats_score"] or 0), row["file"]
+    ))
+
+
+# Function to render rows as CSV text
+def results_to_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=RESULT_FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+# Function to expand folders into the PDF and text files they contain
+def collect_resume_paths(paths):
+    resume_paths = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(('.pdf', '.txt')):
+                    resume_paths.append(os.path.join(path, name))
+        else:
+            resume_paths.append(path)
+    return resume_paths
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if "--serve-extraction" in argv:
+        extract_parser = argparse.ArgumentParser()
+        extract_parser.add_argument("--serve-extraction", type=int, required=True, metavar="RESULT_FD")
+        extract_parser.add_argument("--extract-workers", type=int, default=BATCH_EXTRACT_WORKERS)
+        args = extract_parser.parse_args(argv)
+        serve_extraction(args.serve_extraction, args.extract_workers)
+        return 0
+
+    parser = argparse.ArgumentParser(description="Rank many resumes against one job description.")
+    parser.add_argument("jd", help="Job description file (PDF or text)")
+    parser.add_argument("resumes", nargs="+", help="Resume files or folders of resumes")
+    parser.add_argument("-o", "--output", default="screening_results.csv", help="CSV file to write")
+    parser.add_argument("--workers", type=int, default=BATCH_LLM_WORKERS,
+                        help="Concurrent analysis requests")
+    parser.add_argument("--extract-workers", type=int, default=BATCH_EXTRACT_WORKERS,
+                        help="Worker processes for text extraction")
+    parser.add_argument("--rpm", type=int, default=BATCH_REQUESTS_PER_MINUTE,
+                        help="Maximum analysis requests per minute (0 for no limit)")
+    parser.add_argument("--top-k", type=int, default=None,
+                        help="Only send the K best resumes by local ATS score to the LLM")
+    args = parser.parse_args(argv)
+
+    jd_text = extract_path(args.jd)
+    resume_paths = collect_resume_paths(args.resumes)
+    if not resume_paths:
+        print("No resume files found.")
+        return 1
+
+    print(f"Screening {len(resume_paths)} resumes...")
+    rows = []
+    with open(args.output, "w", newline="", encoding="utf-8") as file:
+        # Rows are written in completion order so partial results survive interruption
+        writer = csv.DictWriter(file, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        resumes = extract_files(resume_paths, args.extract_workers)
+        for row in screen_resumes(resumes, jd_text, args.workers, args.rpm, args.top_k):
+            rows.append(row)
+            writer.writerow(row)
+            file.flush()
+            score = row["score"] if row["score"] is not None else "N/A"
+            print(f"[{len(rows)}/{len(resume_paths)}] {row['file']}: "
+                  f"{score} (ATS {row['ats_score']}) {row['error']}".rstrip())
+
+    print("\nRanking:")
+    for i, row in enumerate(rank_results(rows), 1):
+        score = row["score"] if row["score"] is not None else "N/A"
+        print(f"{i}. {score:>3}  ATS {row['ats_score']!s:>3}  {row['file']}")
+    print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,311 @@
+import os
+import sys
+import json
+import math
+import time
+import platform
+import argparse
+import tracemalloc
+from datetime import datetime, timezone
+import fitz  # PyMuPDF
+from analysis import (
+    IncrementalAnalysisParser, IncrementalJSONAnalysisParser, parse_analysis, parse_structured_analysis
+)
+from compaction import clean_text, compact_pair
+from docx_export import clear_section_part_cache, create_word_resume
+from engine import ANALYSIS_PROVIDERS, build_analysis_prompt, compact_enhance_prompt, provider_prompts
+from extraction import PDF_TYPE, extract_text, text_cache
+from ingest import extract_text_from_pdf
+
+# Offline benchmark of the extraction -> prompt -> parse -> DOCX pipeline. LLM
+# responses come from recorded fixtures, so no provider is called.
+
+BENCHMARK_DIR = "benchmarks"
+FIXTURE_DIR = os.path.join(BENCHMARK_DIR, "fixtures")
+PDF_DIR = "pdf"
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+DEFAULT_ITERATIONS = 20
+DEFAULT_THRESHOLD = 0.25
+# Slowdowns smaller than this are timer noise, whatever the ratio
+MIN_REGRESSION_MS = 1.0
+STREAM_CHUNK_CHARS = 20
+
+
+# Stands in for a Streamlit UploadedFile
+class BenchmarkUpload:
+    def __init__(self, name, data, file_type):
+        self.name = name
+        self.type = file_type
+        self._data = data
+
+    def getvalue(self):
+        return self._data
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as file:
+        return file.read()
+
+
+# Function to build a deterministic resume with many sections and bullets
+def synthetic_resume(jobs=12, bullets=15):
+    lines = ["Jane Doe", "jane.doe@example.com | +1 555 0100", "", "SUMMARY",
+             "Backend engineer building scalable Python services, APIs and data pipelines.", "",
+             "SKILLS", "Python, Go, SQL, FastAPI, Django, AWS, Docker, Kubernetes, Terraform, Kafka", "",
+             "EXPERIENCE"]
+    for job in range(jobs):
+        lines.append(f"Software Engineer {job}, Company {job} (20{10 + job % 10} - 20{11 + job % 10})")
+        for bullet in range(bullets):
+            lines.append(f"- Delivered project {job}.{bullet} using Python and AWS, improving "
+                         f"throughput by {5 + bullet}% for {100 * (job + 1)} customers")
+        lines.append("")
+    lines += ["EDUCATION", "B.Sc. Computer Science, State University", "", "HOBBIES", "Chess, running"]
+    return "\n".join(lines)
+
+
+# Function to build a deterministic JD with boilerplate a real posting carries
+def synthetic_jd(requirements=60):
+    lines = ["About us", "We build hiring software used by thousands of companies.", "", "Requirements"]
+    lines += [f"- Experience with technology {i} in production environments" for i in range(requirements)]
+    lines += ["", "Benefits", "- Health insurance", "- Remote work",
+              "We are an equal opportunity employer and value diversity at our company."]
+    return "\n".join(lines)
+
+
+# Function to turn resume text into markdown the enhancement step would return
+def synthetic_markdown(resume_text):
+    lines = []
+    for line in resume_text.split("\n"):
+        if line.isupper():
+            lines.append(f"## {line.title()}")
+        elif line.startswith("- "):
+            lines.append(line.replace("Python", "**Python**").replace("AWS", "*AWS*"))
+        else:
+            lines.append(line)
+    return "\n".join(lines)
+
+
+# Function to render text into a multi-page PDF with a repeated header, as bytes
+def synthetic_pdf(text, lines_per_page=45):
+    lines = text.split("\n")
+    doc = fitz.open()
+    for start in range(0, len(lines), lines_per_page):
+        page = doc.new_page()
+        page_text = "\n".join(["Jane Doe - Resume"] + lines[start:start + lines_per_page])
+        page.insert_textbox(fitz.Rect(50, 50, 560, 790), page_text, fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+# Function to reset caches so every iteration measures the uncached path
+def clear_caches():
+    text_cache.clear()
+    compact_pair.cache_clear()
+    clean_text.cache_clear()
+    clear_section_part_cache()
+
+
+def stream_parse_analysis(analysis_text, parser_class=IncrementalAnalysisParser):
+    parser = parser_class()
+    for start in range(0, len(analysis_text), STREAM_CHUNK_CHARS):
+        parser.feed(analysis_text[start:start + STREAM_CHUNK_CHARS])
+    parser.close()
+    return parser
+
+
+# Function to run the whole single-resume flow with recorded LLM responses
+def run_pipeline(upload, jd_text, analysis_text, enhanced_text):
+    clear_caches()
+    resume_text = extract_text(upload)
+    provider_prompts(ANALYSIS_PROVIDERS, build_analysis_prompt, resume_text, jd_text)
+    parse_analysis(analysis_text)
+    compact_enhance_prompt(resume_text, jd_text, "N/A")
+    return create_word_resume(enhanced_text)
+
+
+# Function to list (case name, fn, input bytes) for every stage and input
+def build_cases():
+    analysis_text = load_fixture("analysis.txt")
+    analysis_json = load_fixture("analysis.json")
+    enhanced_text = load_fixture("enhanced_resume.md")
+    resume_text = synthetic_resume()
+    jd_text = synthetic_jd()
+    extra_strengths = "\n".join(f"- Strength {i}: matches requirement {i}" for i in range(200))
+    large_analysis = analysis_text.replace("**Top Gaps", extra_strengths + "\n\n**Top Gaps")
+    large_markdown = synthetic_markdown(synthetic_resume(jobs=40))
+
+    pdf_paths = sorted(
+        os.path.join(PDF_DIR, name) for name in os.listdir(PDF_DIR) if name.lower().endswith(".pdf")
+    ) if os.path.isdir(PDF_DIR) else []
+    uploads = []
+    for path in pdf_paths:
+        with open(path, "rb") as file:
+            uploads.append(BenchmarkUpload(os.path.basename(path), file.read(), PDF_TYPE))
+    uploads.append(BenchmarkUpload("synthetic_resume.pdf", synthetic_pdf(resume_text), PDF_TYPE))
+    uploads.append(BenchmarkUpload("synthetic_large.pdf", synthetic_pdf(synthetic_resume(jobs=60)), PDF_TYPE))
+
+    def extract_case(upload):
+        def run():
+            clear_caches()
+            return extract_text(upload)
+        return run
+
+    def prompt_case(resume, jd):
+        def run():
+            clear_caches()
+            return provider_prompts(ANALYSIS_PROVIDERS, build_analysis_prompt, resume, jd)
+        return run
+
+    def enhance_prompt_case(resume, jd):
+        def run():
+            clear_caches()
+            return compact_enhance_prompt(resume, jd, "N/A")
+        return run
+
+    def docx_case(markdown_text):
+        def run():
+            clear_caches()
+            return create_word_resume(markdown_text)
+        return run
+
+    cases = []
+    for upload in uploads:
+        size = len(upload.getvalue())
+        cases.append((f"extract_text[{upload.name}]", extract_case(upload), size))
+    for path in pdf_paths:
+        cases.append((f"extract_text_from_pdf[{os.path.basename(path)}]",
+                      lambda path=path: extract_text_from_pdf(path), os.path.getsize(path)))
+
+    large_resume = synthetic_resume(jobs=60)
+    cases += [
+        ("analysis_prompt[synthetic]", prompt_case(resume_text, jd_text), len(resume_text) + len(jd_text)),
+        ("analysis_prompt[synthetic_large]", prompt_case(large_resume, jd_text),
+         len(large_resume) + len(jd_text)),
+        ("enhance_prompt[synthetic]", enhance_prompt_case(resume_text, jd_text),
+         len(resume_text) + len(jd_text)),
+        ("parse_analysis[recorded]", lambda: parse_analysis(analysis_text), len(analysis_text)),
+        ("parse_analysis[large]", lambda: parse_analysis(large_analysis), len(large_analysis)),
+        ("stream_parse_analysis[recorded]", lambda: stream_parse_analysis(analysis_text), len(analysis_text)),
+        ("parse_analysis_json[recorded]", lambda: parse_structured_analysis(analysis_json), len(analysis_json)),
+        ("stream_parse_analysis_json[recorded]",
+         lambda: stream_parse_analysis(analysis_json, IncrementalJSONAnalysisParser), len(analysis_json)),
+        ("create_word_resume[recorded]", docx_case(enhanced_text), len(enhanced_text)),
+        ("create_word_resume[synthetic_large]", docx_case(large_markdown), len(large_markdown)),
+        ("create_word_resume[synthetic_large_cached]", lambda: create_word_resume(large_markdown),
+         len(large_markdown)),
+    ]
+    for upload in uploads[-2:]:
+        cases.append((f"pipeline[{upload.name}]",
+                      lambda upload=upload: run_pipeline(upload, jd_text, analysis_text, enhanced_text),
+                      len(upload.getvalue())))
+    return cases
+
+
+# Nearest-rank percentile of sorted values
+def percentile(sorted_values, pct):
+    return sorted_values[max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)]
+
+
+# Function to time a case, then measure its peak Python memory in one extra run.
+# tracemalloc slows the code it traces, so timing and memory are measured separately;
+# it also only sees Python allocations, not MuPDF's native ones.
+def measure(fn, input_bytes, iterations):
+    fn()  # warm-up
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    total = sum(durations)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "iterations": iterations,
+        "p50_ms": round(percentile(durations, 50) * 1000, 3),
+        "p95_ms": round(percentile(durations, 95) * 1000, 3),
+        "ops_per_sec": round(iterations / total, 2) if total else None,
+        "mb_per_sec": round(input_bytes * iterations / total / 1e6, 2) if total else None,
+        "peak_memory_kb": round(peak / 1024, 1),
+        "input_bytes": input_bytes,
+    }
+
+
+def run_benchmarks(iterations, name_filter=None):
+    results = {}
+    for name, fn, input_bytes in build_cases():
+        if name_filter and name_filter not in name:
+            continue
+        results[name] = measure(fn, input_bytes, iterations)
+        row = results[name]
+        print(f"{name:<48} p50 {row['p50_ms']:>9.3f} ms  p95 {row['p95_ms']:>9.3f} ms  "
+              f"{row['ops_per_sec']:>9} ops/s  peak {row['peak_memory_kb']:>9.1f} KB")
+    return results
+
+
+# Function to list cases whose p50 or p95 grew by more than the threshold over the baseline,
+# and cases the baseline does not have (it predates them and needs regenerating)
+def compare_results(results, baseline, threshold):
+    regressions = []
+    for name, row in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            regressions.append(f"{name}: not in the baseline; regenerate it with --save")
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if (base[metric] and row[metric] > base[metric] * (1 + threshold)
+                    and row[metric] - base[metric] >= MIN_REGRESSION_MS):
+                regressions.append(
+                    f"{name} {metric}: {base[metric]:.3f} -> {row[metric]:.3f} ms "
+                    f"(+{(row[metric] / base[metric] - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the resume pipeline offline.")
+    parser.add_argument("-n", "--iterations", type=int, default=DEFAULT_ITERATIONS,
+                        help="Timed runs per case")
+    parser.add_argument("-k", "--filter", default=None, help="Only run cases whose name contains this")
+    parser.add_argument("--save", nargs="?", const=DEFAULT_BASELINE, default=None,
+                        help=f"Write results as a baseline JSON file (default {DEFAULT_BASELINE})")
+    parser.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE, default=None,
+                        help="Compare against a baseline JSON file and exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown before a case counts as a regression (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.iterations, args.filter)
+
+    if args.save:
+        report = {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+        }
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"\nBaseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare_results(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressions against {args.compare}:")
+            for regression in regressions:
+                print(f"- {regression}")
+            return 1
+        print(f"\nNo regressions against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+
+# Token-aware preprocessing of resume and JD text before it is put into a prompt
+
+MODEL_CONTEXT_TOKENS = {
+    "llama3-70b-8192": 8192,
+    "gemini-1.5-pro": 1_000_000,
+}
+RESERVED_OUTPUT_TOKENS = int(os.getenv("RESERVED_OUTPUT_TOKENS", "2048"))
+# count_tokens is an estimate, so this share of the input budget is held back
+TOKEN_ESTIMATE_MARGIN = 0.15
+# Instructions and labels around the inputs in the analysis/enhancement prompts
+PROMPT_OVERHEAD_TOKENS = 300
+# Share of the input budget given to the resume; unused share moves to the JD
+RESUME_SHARE = 0.6
+
+# Extracted PDF pages are separated by form feeds
+PAGE_BREAK = "\f"
+# Lines this close to the top or bottom of a page count as its header or footer
+PAGE_EDGE_LINES = 3
+# Header/footer lines found on this many pages are kept only once
+DUPLICATE_MIN_REPEATS = 2
+DUPLICATE_MIN_LENGTH = 20
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+BOILERPLATE_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r"^page \d+( of \d+)?$",
+    r"^downloaded from:",
+    r"^terms of use:",
+    r"equal opportunity employer",
+    r"reasonable accommodation",
+    r"without regard to (race|age|gender)",
+)]
+# A bare page number such as "2", "- 2 -" or "2/3"; only removed at a page edge
+# when it matches that page's number
+PAGE_NUMBER_PATTERN = re.compile(r"^[-–—\s]*(\d{1,3})(?:\s*/\s*(\d{1,3}))?[-–—\s]*$")
+
+# Lower numbers are kept longest when trimming; the untitled preamble (name and
+# contact details) is kept longest of all
+RESUME_SECTION_PRIORITY = {
+    "skill": 1, "experience": 1, "employment": 1, "work history": 1,
+    "project": 2, "summary": 2, "profile": 2, "objective": 3,
+    "certification": 3, "education": 3, "award": 4, "publication": 4,
+    "interest": 5, "hobbies": 5, "reference": 5,
+}
+JD_SECTION_PRIORITY = {
+    "requirement": 1, "qualification": 1, "responsibilit": 1, "skill": 1, "must have": 1,
+    "what you": 2, "role": 2, "preferred": 2, "nice to have": 3,
+    "about": 4, "company": 4, "benefit": 5, "perks": 5, "salary": 5, "compensation": 5,
+}
+UNKNOWN_SECTION_PRIORITY = 3
+HEADING_MAX_LENGTH = 40
+
+
+# Function to count tokens (words and punctuation approximate BPE tokens closely enough)
+def count_tokens(text):
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def _edge_indexes(lines):
+    filled = [i for i, line in enumerate(lines) if line]
+    return set(filled[:PAGE_EDGE_LINES] + filled[-PAGE_EDGE_LINES:])
+
+
+def _is_page_number(line, page_number, page_count):
+    match = PAGE_NUMBER_PATTERN.match(line)
+    if match is None or int(match.group(1)) != page_number:
+        return False
+    return match.group(2) is None or int(match.group(2)) == page_count
+
+
+# Function to normalize whitespace, drop boilerplate and page numbers, and keep page
+# headers/footers once. Only lines at the top or bottom of a page are treated as page
+# furniture, so dates, scores and bullets in the body are never removed.
+@lru_cache(maxsize=128)
+def clean_text(text):
+    pages = []
+    for page in (text or "").split(PAGE_BREAK):
+        lines = [re.sub(r"[ \t\u00a0]+", " ", line).strip() for line in page.splitlines()]
+        pages.append([line for line in lines if not any(pattern.search(line) for pattern in BOILERPLATE_PATTERNS)])
+
+    multi_page = len(pages) > 1
+    edges = [_edge_indexes(lines) if multi_page else set() for lines in pages]
+    counts = Counter(
+        line for lines, edge in zip(pages, edges)
+        for line in {lines[i] for i in edge if len(lines[i]) >= DUPLICATE_MIN_LENGTH}
+    )
+    seen = set()
+    kept = []
+    for page_number, (lines, edge) in enumerate(zip(pages, edges), start=1):
+        for i, line in enumerate(lines):
+            if i in edge:
+                if _is_page_number(line, page_number, len(pages)):
+                    continue
+                if counts.get(line, 0) >= DUPLICATE_MIN_REPEATS:
+                    if line in seen:
+                        continue
+                    seen.add(line)
+            # Collapse runs of blank lines
+            if not line and (not kept or not kept[-1]):
+                continue
+            kept.append(line)
+    return "\n".join(kept).strip()
+
+
+def _heading_priority(line, priorities):
+    if not line or len(line) > HEADING_MAX_LENGTH:
+        return None
+    lowered = line.lower().rstrip(":")
+    for keyword, priority in priorities.items():
+        if keyword in lowered:
+            return priority
+    if line.isupper() and any(char.isalpha() for char in line):
+        return UNKNOWN_SECTION_PRIORITY
+    return None
+
+
+# Function to split text into sections of [priority, lines, line token counts]
+def split_sections(text, priorities):
+    sections = [[0, [], []]]
+    for line in text.split("\n"):
+        priority = _heading_priority(line, priorities)
+        if priority is not None:
+            sections.append([priority, [], []])
+        sections[-1][1].append(line)
+        sections[-1][2].append(count_tokens(line))
+    return sections
+
+
+# Function to trim text to a token budget, cutting the least important sections first
+def trim_to_budget(text, budget, priorities):
+    sections = split_sections(text, priorities)
+    total = sum(sum(tokens) for _, _, tokens in sections)
+    for section in sorted(sections, key=lambda section: -section[0]):
+        _, lines, tokens = section
+        while total > budget and lines:
+            lines.pop()
+            total -= tokens.pop()
+        if total <= budget:
+            break
+    return "\n".join(line for _, lines, _ in sections for line in lines).strip()
+
+
+# Function to compute the input token budget shared by a resume and a JD for a model chain
+def input_budget(models, extra_tokens=0):
+    context = min(MODEL_CONTEXT_TOKENS.get(model, 8192) for model in models)
+    available = context - RESERVED_OUTPUT_TOKENS - PROMPT_OVERHEAD_TOKENS - extra_tokens
+    return max(0, int(available * (1 - TOKEN_ESTIMATE_MARGIN)))
+
+
+# Function to clean a resume/JD pair and trim it to a token budget if it is still over,
+# with before/after counts. Cleaning only removes whitespace, boilerplate and page
+# furniture, so it always runs.
+@lru_cache(maxsize=64)
+def compact_pair(resume_text, jd_text, budget):
+    resume_text = resume_text or ""
+    jd_text = jd_text or ""
+    resume_compact = clean_text(resume_text)
+    jd_compact = clean_text(jd_text)
+    resume_clean_tokens = count_tokens(resume_compact)
+    jd_clean_tokens = count_tokens(jd_compact)
+
+    if resume_clean_tokens + jd_clean_tokens > budget:
+        resume_budget = int(budget * RESUME_SHARE)
+        jd_budget = budget - resume_budget
+        # Hand any unused share to the other document
+        if resume_clean_tokens < resume_budget:
+            jd_budget += resume_budget - resume_clean_tokens
+        elif jd_clean_tokens < jd_budget:
+            resume_budget += jd_budget - jd_clean_tokens
+        resume_compact = trim_to_budget(resume_compact, resume_budget, RESUME_SECTION_PRIORITY)
+        jd_compact = trim_to_budget(jd_compact, jd_budget, JD_SECTION_PRIORITY)
+
+    report = {
+        "budget": budget,
+        "resume_tokens_before": count_tokens(resume_text),
+        "resume_tokens_after": count_tokens(resume_compact),
+        "jd_tokens_before": count_tokens(jd_text),
+        "jd_tokens_after": count_tokens(jd_compact),
+    }
+    return resume_compact, jd_compact, report
@@ -0,0 +1,315 @@
+import io
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from xml.sax.saxutils import escape, quoteattr
+from docx import Document
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+from markdown_it import MarkdownIt
+from metrics import instrument, record_cache
+from sections import split_sections
+
+# Markdown is rendered to WordprocessingML in one pass over the markdown-it tokens,
+# with no intermediate HTML. Each section's XML is cached, so edits re-render only
+# what changed, and the template is read once and cloned from memory per export.
+
+# Optional .docx whose styles (fonts, heading and list looks) the export uses
+DOCX_TEMPLATE_PATH = os.getenv("DOCX_TEMPLATE_PATH")
+SECTION_PART_CACHE_MAX_ENTRIES = 256
+MAX_LIST_STYLE_LEVEL = 3
+HYPERLINK_COLOR = "0563C1"
+CODE_FONT = "Courier New"
+
+# Characters XML 1.0 does not allow, which would make the document unreadable
+INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+BLOCK_HEADING = re.compile(r"^#{1,6}(\s|$)")
+LIST_MARKER = re.compile(r"^([-+*]|\d{1,9}[.)])(\s|$)")
+FENCE = re.compile(r"^\s*(`{3,}|~{3,})")
+# Section-local list number in rendered XML, replaced by a real numId on export
+LIST_NUM_PLACEHOLDER = re.compile(r'w:numId w:val="#(\d+)"')
+
+_markdown = MarkdownIt("commonmark", {"html": False})
+_part_cache = OrderedDict()
+_part_cache_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def template_bytes():
+    if DOCX_TEMPLATE_PATH:
+        with open(DOCX_TEMPLATE_PATH, "rb") as file:
+            return file.read()
+    buffer = io.BytesIO()
+    Document().save(buffer)
+    return buffer.getvalue()
+
+
+# Style name -> style id in the template, e.g. "List Bullet 2" -> "ListBullet2"
+@lru_cache(maxsize=1)
+def template_style_ids():
+    document = Document(io.BytesIO(template_bytes()))
+    return {style.name: style.style_id for style in document.styles}
+
+
+# List style id -> (abstractNumId, ilvl) of the numbering it uses in the template
+@lru_cache(maxsize=1)
+def template_list_numbering():
+    document = Document(io.BytesIO(template_bytes()))
+    numbering = {}
+    for style in document.styles:
+        ppr = getattr(style.element, "pPr", None)
+        num_pr = ppr.numPr if ppr is not None else None
+        if num_pr is None or num_pr.numId is None:
+            continue
+        try:
+            num = document.part.numbering_part.element.num_having_numId(num_pr.numId.val)
+        except (KeyError, NotImplementedError):
+            continue
+        ilvl = num_pr.ilvl.val if num_pr.ilvl is not None else 0
+        numbering[style.style_id] = (num.abstractNumId.val, ilvl)
+    return numbering
+
+
+def _style_id(name):
+    style_ids = template_style_ids()
+    if name in style_ids:
+        return style_ids[name]
+    # A custom template may only define the first level, e.g. "List Bullet"
+    return style_ids.get(name.rsplit(" ", 1)[0]) if name[-1].isdigit() else None
+
+
+# number is (section-local list index, ilvl) for the first paragraph of an ordered item
+def _paragraph_open(style_name, number=None):
+    style_id = _style_id(style_name) if style_name else None
+    if not style_id:
+        return "<w:p>"
+    num_pr = ""
+    if number:
+        num_pr = f'<w:numPr><w:ilvl w:val="{number[1]}"/><w:numId w:val="#{number[0]}"/></w:numPr>'
+    return f"<w:p><w:pPr><w:pStyle w:val={quoteattr(style_id)}/>{num_pr}</w:pPr>"
+
+
+def _run(text, bold=False, italic=False, code=False, link=False):
+    properties = []
+    if code:
+        properties.append(f'<w:rFonts w:ascii="{CODE_FONT}" w:hAnsi="{CODE_FONT}"/>')
+    if bold:
+        properties.append("<w:b/>")
+    if italic:
+        properties.append("<w:i/>")
+    if link:
+        properties.append(f'<w:color w:val="{HYPERLINK_COLOR}"/><w:u w:val="single"/>')
+    rpr = f"<w:rPr>{''.join(properties)}</w:rPr>" if properties else ""
+    text = escape(INVALID_XML_CHARS.sub("", text))
+    return f'<w:r>{rpr}<w:t xml:space="preserve">{text}</w:t></w:r>'
+
+
+def _list_style(list_stack, first_paragraph):
+    level = min(len(list_stack), MAX_LIST_STYLE_LEVEL)
+    if not first_paragraph:
+        base = "List Continue"
+    else:
+        base = "List Number" if list_stack[-1] == "ordered_list" else "List Bullet"
+    return base if level == 1 else f"{base} {level}"
+
+
+# Function to render the inline tokens of one paragraph as runs, collecting link targets
+def _render_inline(children, out, links):
+    bold = italic = 0
+    link = False
+    for token in children:
+        kind = token.type
+        if kind == "text" and token.content:
+            out.append(_run(token.content, bold > 0, italic > 0, link=link))
+        elif kind == "code_inline":
+            out.append(_run(token.content, bold > 0, italic > 0, code=True, link=link))
+        elif kind in ("softbreak", "hardbreak"):
+            out.append("<w:r><w:br/></w:r>")
+        elif kind == "strong_open":
+            bold += 1
+        elif kind == "strong_close":
+            bold -= 1
+        elif kind == "em_open":
+            italic += 1
+        elif kind == "em_close":
+            italic -= 1
+        elif kind == "link_open":
+            href = token.attrGet("href") or ""
+            if href:
+                links.append(href)
+                # The relationship id is assigned when the section is placed in a document
+                out.append('<w:hyperlink r:id="">')
+                link = True
+        elif kind == "link_close":
+            if link:
+                out.append("</w:hyperlink>")
+                link = False
+        elif kind == "image" and token.content:
+            out.append(_run(token.content, bold > 0, italic > 0, link=link))
+
+
+# Function to split markdown into top-level blocks that can be tokenized one at a time,
+# so long sections (e.g. many jobs) never hold all of their tokens at once. A block
+# starts at a heading, or at an unindented non-list line after a blank line; either
+# closes every open paragraph and list. Code fences are never split.
+def _top_level_blocks(markdown_text):
+    block = []
+    fence = None
+    after_blank = False
+    for line in markdown_text.split("\n"):
+        match = FENCE.match(line)
+        if fence:
+            if match and match.group(1)[0] == fence[0] and len(match.group(1)) >= len(fence):
+                fence = None
+        else:
+            starts_block = BLOCK_HEADING.match(line) or (
+                after_blank and line[:1].strip() and not LIST_MARKER.match(line)
+            )
+            if starts_block and block:
+                yield "\n".join(block)
+                block = []
+            if match:
+                fence = match.group(1)
+        after_blank = not line.strip()
+        block.append(line)
+    if block:
+        yield "\n".join(block)
+
+
+# Function to turn markdown into (WordprocessingML paragraphs, hyperlink targets in order,
+# ordered lists as (abstractNumId, ilvl, start) in list-index order)
+def render_markdown(markdown_text):
+    out = []
+    links = []
+    lists = []
+    for block in _top_level_blocks(markdown_text):
+        _render_tokens(_markdown.parse(block), out, links, lists)
+    return "".join(out), links, lists
+
+
+# Function to append the paragraphs for one block's tokens. Every ordered list gets its
+# own list index, so its numbering starts over instead of continuing the previous list.
+def _render_tokens(tokens, out, links, lists):
+    list_stack = []
+    # Per open list: (list index, ilvl) if it is an ordered list with template numbering
+    list_numbers = []
+    # One flag per open list item: whether its first paragraph (the bullet) is written
+    item_started = []
+    paragraph_style = None
+    paragraph_number = None
+
+    for token in tokens:
+        kind = token.type
+        if kind == "heading_open":
+            paragraph_style = f"Heading {token.tag[1]}"
+        elif kind == "paragraph_open":
+            if list_stack:
+                paragraph_style = _list_style(list_stack, not item_started[-1])
+                paragraph_number = None if item_started[-1] else list_numbers[-1]
+                item_started[-1] = True
+            else:
+                paragraph_style = paragraph_number = None
+        elif kind == "inline":
+            out.append(_paragraph_open(paragraph_style, paragraph_number))
+            _render_inline(token.children or (), out, links)
+            out.append("</w:p>")
+            paragraph_number = None
+        elif kind in ("bullet_list_open", "ordered_list_open"):
+            list_stack.append(kind[:-5])
+            numbering = None
+            if kind == "ordered_list_open":
+                style_id = _style_id(_list_style(list_stack, True))
+                numbering = template_list_numbering().get(style_id)
+            if numbering:
+                lists.append((numbering[0], numbering[1], int(token.attrGet("start") or 1)))
+                list_numbers.append((len(lists) - 1, numbering[1]))
+            else:
+                list_numbers.append(None)
+        elif kind in ("bullet_list_close", "ordered_list_close"):
+            list_stack.pop()
+            list_numbers.pop()
+        elif kind == "list_item_open":
+            item_started.append(False)
+        elif kind == "list_item_close":
+            # An item with no text of its own (e.g. only a nested list) still gets its bullet
+            if not item_started.pop():
+                style = _list_style(list_stack, True)
+                out.append(_paragraph_open(style, list_numbers[-1]) + "</w:p>")
+        elif kind in ("fence", "code_block"):
+            style = _list_style(list_stack, False) if list_stack else None
+            lines = token.content.rstrip("\n").split("\n")
+            out.append(_paragraph_open(style))
+            out.append("<w:r><w:br/></w:r>".join(_run(line, code=True) for line in lines))
+            out.append("</w:p>")
+
+
+# Function to get the rendered (xml, links, lists) of each section, rendering only cache misses
+def section_parts(sections):
+    parts = [None] * len(sections)
+    with _part_cache_lock:
+        for i, section in enumerate(sections):
+            parts[i] = _part_cache.get(section)
+            if parts[i] is not None:
+                _part_cache.move_to_end(section)
+            record_cache("docx_section", parts[i] is not None)
+
+    missing = [i for i, part in enumerate(parts) if part is None]
+    for i in missing:
+        parts[i] = render_markdown(sections[i])
+    if missing:
+        with _part_cache_lock:
+            for i in missing:
+                _part_cache[sections[i]] = parts[i]
+            while len(_part_cache) > SECTION_PART_CACHE_MAX_ENTRIES:
+                _part_cache.popitem(last=False)
+    return parts
+
+
+def clear_section_part_cache():
+    with _part_cache_lock:
+        _part_cache.clear()
+
+
+# Function to add a w:num for one ordered list, restarting its level at the list's start
+def _add_list_num(numbering, abstract_num_id, ilvl, start):
+    num = numbering.add_num(abstract_num_id)
+    num.add_lvlOverride(ilvl).add_startOverride(start)
+    return num.numId
+
+
+# Function to replace a section's local list indexes with new numIds in the document
+def _number_lists(doc, xml, lists):
+    if not lists:
+        return xml
+    numbering = doc.part.numbering_part.element
+    num_ids = [_add_list_num(numbering, *ordered_list) for ordered_list in lists]
+    return LIST_NUM_PLACEHOLDER.sub(lambda match: f'w:numId w:val="{num_ids[int(match.group(1))]}"', xml)
+
+
+# Function to convert the enhanced resume markdown into DOCX bytes, assembled from
+# per-section parts
+@instrument("create_word_resume")
+def create_word_resume(enhanced_resume_text):
+    doc = Document(io.BytesIO(template_bytes()))
+    parts = section_parts(split_sections(enhanced_resume_text))
+    body_xml = "".join(_number_lists(doc, xml, lists) for xml, _, lists in parts)
+    links = [link for _, section_links, _ in parts for link in section_links]
+
+    if body_xml:
+        fragment = parse_xml(f"<w:body {nsdecls('w', 'r')}>{body_xml}</w:body>")
+        for hyperlink, url in zip(fragment.iter(qn("w:hyperlink")), links):
+            hyperlink.set(qn("r:id"), doc.part.relate_to(url, RT.HYPERLINK, is_external=True))
+        body = doc.element.body
+        for element in list(fragment):
+            if body.sectPr is not None:
+                body.sectPr.addprevious(element)
+            else:
+                body.append(element)
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
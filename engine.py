@@ -0,0 +1,488 @@
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+from analysis import (
+    IncrementalAnalysisParser, IncrementalJSONAnalysisParser, AnalysisFormatError,
+    analysis_from_text, parse_structured_analysis
+)
+from compaction import compact_pair, count_tokens, input_budget
+from metrics import track, record_cache, record_tokens
+from providers import registry, GROQ_MODEL, GEMINI_MODEL, GEMINI_TIMEOUT
+from resilience import call_with_fallback, stream_with_fallback
+from response_cache import response_cache, make_key
+from sections import split_sections, join_sections, section_title
+from singleflight import SingleFlight
+
+# Model settings (part of the response cache key)
+GROQ_TEMPERATURE = 0.3
+ANALYSIS_PROMPT_VERSION = "2"
+
+# "json" asks the model for a schema-checked JSON analysis; "text" keeps the free-form report
+ANALYSIS_FORMAT = os.getenv("ANALYSIS_FORMAT", "json")
+# Calls made before giving up on a response that does not match the schema
+STRUCTURED_ANALYSIS_ATTEMPTS = 2
+SECTION_PROMPT_VERSION = "1"
+# Sections rewritten at the same time when several are requested
+SECTION_WORKERS = int(os.getenv("SECTION_WORKERS", "4"))
+
+# Provider order per task; later providers are fallbacks (override via environment)
+ANALYSIS_PROVIDERS = os.getenv("ANALYSIS_PROVIDERS", "groq,gemini").split(",")
+ENHANCE_PROVIDERS = os.getenv("ENHANCE_PROVIDERS", "gemini,groq").split(",")
+PROVIDER_MODELS = {"groq": GROQ_MODEL, "gemini": GEMINI_MODEL}
+
+# Identical concurrent completions share one provider request
+llm_flight = SingleFlight("llm_inflight")
+
+# -------- Functions --------
+
+def _groq_messages(system_prompt, user_prompt):
+    messages = [{"role": "user", "content": user_prompt}]
+    if system_prompt:
+        messages.insert(0, {"role": "system", "content": system_prompt})
+    return messages
+
+def _groq_options(json_mode):
+    return {"response_format": {"type": "json_object"}} if json_mode else {}
+
+# Function to call Groq once; provider errors propagate to the caller
+def call_groq_llama(system_prompt, user_prompt, json_mode=False):
+    with track("groq_call", user_prompt) as record:
+        response = registry.groq().chat.completions.create(
+            model=GROQ_MODEL,
+            messages=_groq_messages(system_prompt, user_prompt),
+            temperature=GROQ_TEMPERATURE,
+            **_groq_options(json_mode)
+        )
+        if response.usage:
+            record_tokens("groq", response.usage.prompt_tokens, response.usage.completion_tokens)
+        content = response.choices[0].message.content
+        record.set_output(content)
+        return content
+
+# Function to yield completion text from Groq's streaming chat API
+def stream_groq_llama(system_prompt, user_prompt, json_mode=False):
+    with track("groq_stream", user_prompt, streaming=True) as record:
+        stream = registry.groq().chat.completions.create(
+            model=GROQ_MODEL,
+            messages=_groq_messages(system_prompt, user_prompt),
+            temperature=GROQ_TEMPERATURE,
+            stream=True,
+            **_groq_options(json_mode)
+        )
+        for chunk in stream:
+            # Groq reports usage on the final chunk
+            usage = chunk.x_groq.usage if chunk.x_groq else None
+            if usage:
+                record_tokens("groq", usage.prompt_tokens, usage.completion_tokens)
+            content = chunk.choices[0].delta.content if chunk.choices else None
+            if content:
+                record.add_chunk(content)
+                yield content
+
+def _gemini_prompt(system_prompt, user_prompt):
+    return f"{system_prompt}\n{user_prompt}" if system_prompt else user_prompt
+
+def _gemini_options(json_mode):
+    return {"generation_config": {"response_mime_type": "application/json"}} if json_mode else {}
+
+def _record_gemini_usage(response):
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        record_tokens("gemini", usage.prompt_token_count, usage.candidates_token_count)
+
+# Function to call Gemini once; provider errors propagate to the caller
+def call_gemini(system_prompt, user_prompt, json_mode=False):
+    with track("gemini_call", user_prompt) as record:
+        model = registry.gemini(GEMINI_MODEL)
+        response = model.generate_content(
+            _gemini_prompt(system_prompt, user_prompt),
+            request_options={"timeout": GEMINI_TIMEOUT},
+            **_gemini_options(json_mode)
+        )
+        _record_gemini_usage(response)
+        record.set_output(response.text)
+        return response.text
+
+# Function to yield completion text from Gemini's streaming API
+def stream_gemini(system_prompt, user_prompt, json_mode=False):
+    with track("gemini_stream", user_prompt, streaming=True) as record:
+        model = registry.gemini(GEMINI_MODEL)
+        response = model.generate_content(
+            _gemini_prompt(system_prompt, user_prompt),
+            stream=True,
+            request_options={"timeout": GEMINI_TIMEOUT},
+            **_gemini_options(json_mode)
+        )
+        last_chunk = None
+        for chunk in response:
+            last_chunk = chunk
+            # Chunks without parts (e.g. safety or finish metadata) carry no text
+            if chunk.parts:
+                record.add_chunk(chunk.text)
+                yield chunk.text
+        # Usage on the last chunk covers the whole response
+        _record_gemini_usage(last_chunk)
+
+PROVIDER_CALLS = {"groq": call_groq_llama, "gemini": call_gemini}
+PROVIDER_STREAMS = {"groq": stream_groq_llama, "gemini": stream_gemini}
+
+def chain_models(providers):
+    return [PROVIDER_MODELS[name] for name in providers]
+
+# Function to map each provider to its user prompt; `user_prompt` is one prompt for all of
+# them, or a {provider: prompt} dict from provider_prompts()
+def prompts_by_provider(providers, user_prompt):
+    return user_prompt if isinstance(user_prompt, dict) else dict.fromkeys(providers, user_prompt)
+
+# Function to key a completion by its prompts and every model setting that shapes the output
+def completion_key(providers, system_prompt, user_prompt, json_mode, streamed):
+    prompts = prompts_by_provider(providers, user_prompt)
+    return make_key(
+        system_prompt, *(prompts[name] for name in providers),
+        models=chain_models(providers),
+        temperature=GROQ_TEMPERATURE,
+        json_mode=json_mode,
+        streamed=streamed,
+    )
+
+# Function to complete a prompt through the resilient layer, falling back across providers.
+# Coalescing happens first, so joined callers use no rate limit or circuit budget.
+def complete(providers, system_prompt, user_prompt, json_mode=False):
+    prompts = prompts_by_provider(providers, user_prompt)
+    return llm_flight.do(
+        completion_key(providers, system_prompt, prompts, json_mode, False),
+        call_with_fallback,
+        [(name, PROVIDER_CALLS[name], (system_prompt, prompts[name], json_mode)) for name in providers]
+    )
+
+# Function to stream a completion through the resilient layer, falling back across providers
+def stream_complete(providers, system_prompt, user_prompt, json_mode=False):
+    prompts = prompts_by_provider(providers, user_prompt)
+    return llm_flight.stream(
+        completion_key(providers, system_prompt, prompts, json_mode, True),
+        stream_with_fallback,
+        [(name, PROVIDER_STREAMS[name], (system_prompt, prompts[name], json_mode)) for name in providers]
+    )
+
+# Function to clean and trim resume/JD text to fit every model in a provider chain.
+# Returns (resume_text, jd_text, report) with token counts before and after.
+def compact_inputs(resume_text, jd_text, providers, extra_tokens=0):
+    budget = input_budget(chain_models(providers), extra_tokens)
+    return compact_pair(resume_text, jd_text, budget)
+
+# Function to build one prompt per provider, each with the inputs compacted to that
+# provider's own context window, so a large-window primary is not cut down to the
+# size of a small fallback. build_prompt(resume_text, jd_text) returns the prompt.
+def provider_prompts(providers, build_prompt, resume_text, jd_text, extra_tokens=0):
+    prompts = {}
+    for name in providers:
+        resume_input, jd_input, _ = compact_inputs(resume_text, jd_text, [name], extra_tokens)
+        prompts[name] = build_prompt(resume_input, jd_input)
+    return prompts
+
+ANALYSIS_SYSTEM_PROMPT = "You are an expert recruiter analyzing resumes."
+
+# Cache keys are looked up before the call, when the provider that will answer is not
+# yet known, so they name the whole provider chain. An answer from a fallback is cached
+# under the same key; changing any model in the chain starts a fresh cache.
+def analysis_cache_key(resume_text, jd_text, output_format="text"):
+    return make_key(
+        resume_text, jd_text,
+        prompt_version=ANALYSIS_PROMPT_VERSION,
+        output_format=output_format,
+        models=chain_models(ANALYSIS_PROVIDERS),
+        temperature=GROQ_TEMPERATURE,
+    )
+
+def build_analysis_prompt(resume_text, jd_text):
+    return f"""
+You are an expert recruiter and career consultant.
+
+Given a candidate's resume and a job description (JD):
+- Assess how well the resume aligns with the JD.
+- Give a *Compatibility Score out of 100*.
+- Highlight *Top 3-5 Strengths* where the resume matches the JD.
+- Point out *Top 3-5 Gaps or Improvements* needed to better align with the JD.
+- Be detailed, specific, and professional.
+- Focus on skills, experiences, certifications, technical expertise, and ATS keywords.
+- Avoid generic statements; back your points with resume or JD references.
+
+Resume:
+{resume_text}
+
+Job Description:
+{jd_text}
+"""
+
+# before_call runs only when the provider is actually called (e.g. a rate limiter)
+def analyze_resume(resume_text, jd_text, before_call=None):
+    with track("analyze_resume", resume_text) as record:
+        cache_key = analysis_cache_key(resume_text, jd_text)
+        cached = response_cache.get(cache_key)
+        record_cache("analysis", cached is not None)
+        if cached is not None:
+            record.set_output(cached)
+            return cached
+
+        if before_call:
+            before_call()
+        prompt = provider_prompts(ANALYSIS_PROVIDERS, build_analysis_prompt, resume_text, jd_text)
+        result = complete(ANALYSIS_PROVIDERS, ANALYSIS_SYSTEM_PROMPT, prompt)
+        if result:
+            response_cache.put(cache_key, result)
+        record.set_output(result)
+        return result
+
+# Function to stream the analysis, replaying cached results in one chunk
+def stream_analyze_resume(resume_text, jd_text):
+    with track("analyze_resume", resume_text, streaming=True) as record:
+        cache_key = analysis_cache_key(resume_text, jd_text)
+        cached = response_cache.get(cache_key)
+        record_cache("analysis", cached is not None)
+        if cached is not None:
+            record.add_chunk(cached)
+            yield cached
+            return
+
+        prompt = provider_prompts(ANALYSIS_PROVIDERS, build_analysis_prompt, resume_text, jd_text)
+        chunks = []
+        for chunk in stream_complete(ANALYSIS_PROVIDERS, ANALYSIS_SYSTEM_PROMPT, prompt):
+            chunks.append(chunk)
+            record.add_chunk(chunk)
+            yield chunk
+        result = "".join(chunks)
+        if result:
+            response_cache.put(cache_key, result)
+
+def build_structured_analysis_prompt(resume_text, jd_text):
+    return f"""
+You are an expert recruiter and career consultant.
+
+Given a candidate's resume and a job description (JD), assess how well the resume aligns with the JD.
+Respond with a single JSON object and nothing else, using exactly these keys:
+- "score": integer compatibility score from 0 to 100
+- "summary": one or two sentences on the overall fit
+- "strengths": 3-5 specific strengths where the resume matches the JD
+- "gaps": 3-5 specific gaps or improvements needed to better align with the JD
+- "matched_keywords": important JD skills and ATS keywords found in the resume
+- "missing_keywords": important JD skills and ATS keywords missing from the resume
+
+Focus on skills, experiences, certifications, technical expertise, and ATS keywords.
+Avoid generic statements; back your points with resume or JD references.
+
+Resume:
+{resume_text}
+
+Job Description:
+{jd_text}
+"""
+
+# Function to get a schema-checked analysis dict, retrying responses that do not validate
+def analyze_resume_structured(resume_text, jd_text, before_call=None):
+    with track("analyze_resume", resume_text):
+        cache_key = analysis_cache_key(resume_text, jd_text, "json")
+        cached = response_cache.get(cache_key)
+        record_cache("analysis", cached is not None)
+        if cached is not None:
+            return json.loads(cached)
+
+        return _request_structured_analysis(
+            resume_text, jd_text, cache_key, STRUCTURED_ANALYSIS_ATTEMPTS, before_call
+        )
+
+# Function to request the JSON analysis without streaming, up to `attempts` times
+def _request_structured_analysis(resume_text, jd_text, cache_key, attempts, before_call=None):
+    prompt = provider_prompts(ANALYSIS_PROVIDERS, build_structured_analysis_prompt, resume_text, jd_text)
+    for attempt in range(attempts):
+        if before_call:
+            before_call()
+        try:
+            analysis = parse_structured_analysis(
+                complete(ANALYSIS_PROVIDERS, ANALYSIS_SYSTEM_PROMPT, prompt, json_mode=True)
+            )
+        except AnalysisFormatError:
+            if attempt + 1 == attempts:
+                raise
+            continue
+        # Only validated results are cached, as compact JSON
+        response_cache.put(cache_key, json.dumps(analysis))
+        return analysis
+
+# Function to stream the JSON analysis text, caching it once it validates
+def stream_analyze_resume_structured(resume_text, jd_text):
+    with track("analyze_resume", resume_text, streaming=True) as record:
+        cache_key = analysis_cache_key(resume_text, jd_text, "json")
+        cached = response_cache.get(cache_key)
+        record_cache("analysis", cached is not None)
+        if cached is not None:
+            record.add_chunk(cached)
+            yield cached
+            return
+
+        prompt = provider_prompts(ANALYSIS_PROVIDERS, build_structured_analysis_prompt, resume_text, jd_text)
+        chunks = []
+        for chunk in stream_complete(ANALYSIS_PROVIDERS, ANALYSIS_SYSTEM_PROMPT, prompt, json_mode=True):
+            chunks.append(chunk)
+            record.add_chunk(chunk)
+            yield chunk
+        try:
+            analysis = parse_structured_analysis("".join(chunks))
+        except AnalysisFormatError:
+            # Kept out of the cache; finish_analysis retries it
+            return
+        response_cache.put(cache_key, json.dumps(analysis))
+
+# Function to get the analysis as a dict in the configured format
+def get_analysis(resume_text, jd_text, before_call=None):
+    if ANALYSIS_FORMAT == "json":
+        return analyze_resume_structured(resume_text, jd_text, before_call)
+    return analysis_from_text(analyze_resume(resume_text, jd_text, before_call))
+
+# Function to stream the analysis in the configured format; pair with new_analysis_parser()
+def stream_analysis(resume_text, jd_text):
+    if ANALYSIS_FORMAT == "json":
+        return stream_analyze_resume_structured(resume_text, jd_text)
+    return stream_analyze_resume(resume_text, jd_text)
+
+def new_analysis_parser():
+    return IncrementalJSONAnalysisParser() if ANALYSIS_FORMAT == "json" else IncrementalAnalysisParser()
+
+# Function to get the final analysis dict once a stream_analysis() stream has been fed to
+# `parser`. A JSON response that does not validate counts as the first attempt; the
+# remaining STRUCTURED_ANALYSIS_ATTEMPTS are made without streaming.
+def finish_analysis(parser, resume_text, jd_text):
+    try:
+        parser.close()
+    except AnalysisFormatError:
+        if ANALYSIS_FORMAT != "json" or STRUCTURED_ANALYSIS_ATTEMPTS < 2:
+            raise
+        cache_key = analysis_cache_key(resume_text, jd_text, "json")
+        return _request_structured_analysis(
+            resume_text, jd_text, cache_key, STRUCTURED_ANALYSIS_ATTEMPTS - 1
+        )
+    return parser.result
+
+def build_enhance_prompt(resume_text, jd_text, reference_text):
+    return f"""
+You are a professional resume writer and career coach specialized in ATS optimization.
+
+Given a candidate's resume, a job description, and some additional material:
+- Rewrite and enhance the resume to maximize compatibility.
+- Incorporate missing important skills, tools, certifications, and responsibilities.
+- Improve phrasing to be professional, quantifiable, and impact-driven.
+- Ensure ATS-friendliness.
+
+Resume:
+{resume_text}
+
+Job Description:
+{jd_text}
+
+Reference Material:
+{reference_text}
+
+Return ONLY the enhanced full resume, no extra explanations. Send in markdown strictly.
+"""
+
+# Function to build the enhancement prompt for each provider, with inputs trimmed around
+# the reference material
+def compact_enhance_prompt(resume_text, jd_text, reference_text):
+    return provider_prompts(
+        ENHANCE_PROVIDERS,
+        lambda resume_input, jd_input: build_enhance_prompt(resume_input, jd_input, reference_text),
+        resume_text, jd_text, extra_tokens=count_tokens(reference_text)
+    )
+
+# The enhancement prompt carries its own instructions, so no system prompt is sent
+def call_gemini_enhance_resume(resume_text, jd_text, reference_text):
+    with track("enhance_resume", resume_text) as record:
+        prompt = compact_enhance_prompt(resume_text, jd_text, reference_text)
+        result = complete(ENHANCE_PROVIDERS, "", prompt)
+        record.set_output(result)
+        return result
+
+# Function to yield the enhanced resume chunk by chunk as it is generated
+def stream_gemini_enhance_resume(resume_text, jd_text, reference_text):
+    with track("enhance_resume", resume_text, streaming=True) as record:
+        prompt = compact_enhance_prompt(resume_text, jd_text, reference_text)
+        for chunk in stream_complete(ENHANCE_PROVIDERS, "", prompt):
+            record.add_chunk(chunk)
+            yield chunk
+
+def build_section_prompt(section_text, jd_text, instruction):
+    request = f"\nAdditional instructions from the candidate: {instruction}\n" if instruction else ""
+    return f"""
+You are a professional resume writer and career coach specialized in ATS optimization.
+
+Rewrite ONLY the following section of a resume to better match the job description.
+- Keep the section heading and the facts; do not invent employers, dates or degrees.
+- Improve phrasing to be professional, quantifiable, and impact-driven.
+- Work in relevant skills and keywords from the job description where they truthfully apply.
+{request}
+Resume section:
+{section_text}
+
+Job Description:
+{jd_text}
+
+Return ONLY the rewritten section in markdown, starting with its heading, no extra explanations.
+"""
+
+def section_cache_key(section_text, jd_text, instruction):
+    return make_key(
+        section_text, jd_text, instruction,
+        prompt_version=SECTION_PROMPT_VERSION,
+        models=chain_models(ENHANCE_PROVIDERS),
+    )
+
+def _clean_section(original, rewritten):
+    rewritten = rewritten.strip()
+    if rewritten.startswith("```"):
+        rewritten = rewritten.split("\n", 1)[1] if "\n" in rewritten else ""
+        rewritten = rewritten.rsplit("```", 1)[0].strip()
+    # Keep the original heading if the model dropped it
+    heading = original.split("\n", 1)[0]
+    if original.startswith("#") and not rewritten.startswith("#"):
+        rewritten = f"{heading}\n\n{rewritten}"
+    return rewritten
+
+# Function to rewrite one section, reusing the cached output for the same section, JD and instruction
+def rewrite_section(section_text, jd_text, instruction=""):
+    with track("rewrite_section", section_text) as record:
+        cache_key = section_cache_key(section_text, jd_text, instruction)
+        cached = response_cache.get(cache_key)
+        record_cache("section", cached is not None)
+        if cached is not None:
+            record.set_output(cached)
+            return cached, True
+
+        prompt = provider_prompts(
+            ENHANCE_PROVIDERS,
+            lambda section_input, jd_input: build_section_prompt(section_input, jd_input, instruction),
+            section_text, jd_text
+        )
+        rewritten = _clean_section(section_text, complete(ENHANCE_PROVIDERS, "", prompt))
+        if rewritten:
+            response_cache.put(cache_key, rewritten)
+        record.set_output(rewritten)
+        return rewritten or section_text, False
+
+# Function to list (index, title) for each section of an enhanced resume
+def list_sections(enhanced_resume_text):
+    return [(i, section_title(section)) for i, section in enumerate(split_sections(enhanced_resume_text))]
+
+# Function to re-enhance only the chosen sections (by index), keeping every other section as is.
+# Returns the reassembled markdown and counts of sections sent, served from cache and kept.
+def reenhance_sections(enhanced_resume_text, jd_text, selected, instruction=""):
+    sections = split_sections(enhanced_resume_text)
+    selected = sorted(i for i in set(selected) if 0 <= i < len(sections))
+    stats = {"sent": 0, "cached": 0, "kept": len(sections) - len(selected)}
+    if not selected:
+        return join_sections(sections), stats
+
+    with ThreadPoolExecutor(max_workers=max(1, min(SECTION_WORKERS, len(selected)))) as executor:
+        results = executor.map(lambda i: rewrite_section(sections[i], jd_text, instruction), selected)
+        for i, (rewritten, cached) in zip(selected, results):
+            sections[i] = rewritten
+            stats["cached" if cached else "sent"] += 1
+    return join_sections(sections), stats
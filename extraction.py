@@ -0,0 +1,143 @@
+import os
+import sys
+import hashlib
+import threading
+from collections import OrderedDict
+import fitz
+from metrics import track, record_cache
+
+# Cache limits for extracted text (shared by every session in this process)
+TEXT_CACHE_MAX_ENTRIES = int(os.getenv("TEXT_CACHE_MAX_ENTRIES", "256"))
+TEXT_CACHE_MAX_BYTES = int(os.getenv("TEXT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Limits enforced before and during parsing (matches server.maxUploadSize)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+MAX_PDF_PAGES = int(os.getenv("MAX_PDF_PAGES", "50"))
+
+PDF_TYPE = "application/pdf"
+
+
+class ExtractionError(ValueError):
+    pass
+
+
+# Bounded LRU cache of extracted text, keyed by a hash of the upload bytes
+class TextCache:
+    def __init__(self, max_entries=TEXT_CACHE_MAX_ENTRIES, max_bytes=TEXT_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            text = self._entries.get(key)
+            if text is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def put(self, key, text):
+        size = sys.getsizeof(text)
+        if size > self.max_bytes:
+            # Never let a single document flush the whole cache
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size -= sys.getsizeof(self._entries.pop(key))
+            self._entries[key] = text
+            self._size += size
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= sys.getsizeof(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+text_cache = TextCache()
+
+
+# Function to hash an upload together with its type
+def content_key(data, file_type):
+    digest = hashlib.sha256(data)
+    digest.update(file_type.encode("utf-8"))
+    return digest.hexdigest()
+
+
+# Function to yield page text straight from an in-memory PDF buffer
+def iter_pdf_pages(data, max_pages=MAX_PDF_PAGES):
+    try:
+        doc = fitz.open(stream=data, filetype="pdf")
+    except Exception as e:
+        raise ExtractionError(f"Could not read PDF: {e}") from e
+    with doc:
+        if doc.page_count > max_pages:
+            raise ExtractionError(
+                f"PDF has {doc.page_count} pages; the limit is {max_pages}."
+            )
+        for page in doc:
+            yield page.get_text()
+
+
+# Function to extract text from PDF bytes with PyMuPDF, with a form feed between pages
+# so page headers and footers can be told apart from the body
+def extract_pdf_text(data, max_pages=MAX_PDF_PAGES):
+    return "\f".join(iter_pdf_pages(data, max_pages))
+
+
+# Function to extract text from raw upload bytes (no caching; safe in worker processes)
+def extract_bytes(data, file_type):
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise ExtractionError(
+            f"File is {len(data) // 1024} KB; the limit is {MAX_UPLOAD_BYTES // 1024} KB."
+        )
+    if file_type == PDF_TYPE:
+        return extract_pdf_text(data)
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError as e:
+        raise ExtractionError("Text files must be UTF-8 encoded.") from e
+
+
+# Function to extract text from a file on disk, picking the type from its extension
+def extract_path(path):
+    with open(path, 'rb') as file:
+        data = file.read()
+    file_type = PDF_TYPE if path.lower().endswith('.pdf') else "text/plain"
+    return extract_bytes(data, file_type)
+
+
+# Function to extract text from upload bytes, reusing cached results
+def extract_cached(data, file_type):
+    with track("extract_text", data) as record:
+        key = content_key(data, file_type)
+
+        text = text_cache.get(key)
+        record_cache("text", text is not None)
+        if text is None:
+            text = extract_bytes(data, file_type)
+            text_cache.put(key, text)
+        record.set_output(text)
+        return text
+
+
+# Function to extract text from a Streamlit upload
+def extract_text(uploaded_file):
+    return extract_cached(uploaded_file.getvalue(), uploaded_file.type)
@@ -0,0 +1,244 @@
+import os
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import fitz
+import PyPDF2
+
+# Ingestion helpers for manage_collection.py. Nothing here touches Chroma: worker
+# processes only extract and chunk PDFs and send the chunks back, and the parent
+# process does every database write.
+
+# Chunking, batching and extraction defaults (override via environment)
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 2)))
+PDF_BACKEND = os.getenv("PDF_BACKEND", "pypdf2")
+PDF_BACKENDS = ("pypdf2", "pymupdf")
+
+# Function to extract the text of each page of a PDF with the chosen backend
+def extract_pages_from_pdf(pdf_path, backend=PDF_BACKEND):
+    try:
+        if backend == "pymupdf":
+            with fitz.open(pdf_path) as doc:
+                return [page.get_text() for page in doc]
+        with open(pdf_path, 'rb') as file:
+            reader = PyPDF2.PdfReader(file)
+            return [page.extract_text() or "" for page in reader.pages]
+    except Exception as e:
+        print(f"Error extracting text from {pdf_path}: {str(e)}")
+        return None
+
+# Function to extract text from PDF
+def extract_text_from_pdf(pdf_path):
+    pages = extract_pages_from_pdf(pdf_path)
+    if pages is None:
+        return None
+    return "".join(page + "\n" for page in pages)
+
+# Function to split text into overlapping windows, returning (start, end) offsets
+def chunk_offsets(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    offsets = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            # Prefer to break on whitespace in the second half of the window
+            lower = start + chunk_size // 2
+            space = max(text.rfind(" ", lower, end), text.rfind("\n", lower, end))
+            if space > start:
+                end = space
+        offsets.append((start, end))
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return offsets
+
+# Function to build the chunk id prefix for a file. It includes a hash of the absolute
+# path, so files with the same name in different folders never share chunk ids.
+def chunk_id_prefix(path):
+    path = os.path.abspath(path)
+    return f"{os.path.basename(path)}#{hashlib.sha1(path.encode('utf-8')).hexdigest()[:12]}"
+
+# Function to chunk a PDF's pages, attaching source, page and offset metadata
+def chunk_pages(pages, source, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP, id_prefix=None):
+    id_prefix = id_prefix or source
+    chunks = []
+    for page_number, page_text in enumerate(pages, 1):
+        for start, end in chunk_offsets(page_text, chunk_size, overlap):
+            chunk = page_text[start:end].strip()
+            if not chunk:
+                continue
+            metadata = {"source": source, "page": page_number, "start": start, "end": end,
+                        "chunk": len(chunks)}
+            chunks.append((f"{id_prefix}::{len(chunks)}", chunk, metadata))
+    return chunks
+
+# Function to upsert chunks in batches the embedding function can take.
+# Returns the number of chunks written and the sources of any failed batches.
+def upsert_in_batches(collection, chunks, batch_size):
+    written = 0
+    failed_sources = set()
+    for i in range(0, len(chunks), batch_size):
+        batch = chunks[i:i + batch_size]
+        try:
+            collection.upsert(
+                ids=[chunk_id for chunk_id, _, _ in batch],
+                documents=[document for _, document, _ in batch],
+                metadatas=[metadata for _, _, metadata in batch]
+            )
+            written += len(batch)
+        except Exception as e:
+            sources = sorted({metadata["source"] for _, _, metadata in batch})
+            failed_sources.update(sources)
+            print(f"Error adding chunks from {', '.join(sources)} to collection: {str(e)}")
+    return written, failed_sources
+
+# Function to hash a file's contents
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Function to load an ingest manifest ({absolute path: file record})
+def load_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, encoding="utf-8") as file:
+        return json.load(file)
+
+# Function to save an ingest manifest atomically
+def save_manifest(manifest_path, manifest):
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+# Function to compare a folder against the manifest.
+# Returns ({path: record} for new or changed files, [paths of removed files]).
+def plan_ingest(folder_path, manifest, settings, incremental=True):
+    folder = os.path.abspath(folder_path)
+    changed = {}
+    seen = set()
+    for name in sorted(os.listdir(folder)):
+        if not name.lower().endswith('.pdf'):
+            continue
+        path = os.path.join(folder, name)
+        seen.add(path)
+        stat = os.stat(path)
+        entry = manifest.get(path)
+        # Files chunked with different settings must be re-processed
+        if entry and entry.get("settings") != settings:
+            entry = None
+        # Size and mtime are checked first so unchanged files are never read
+        if incremental and entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            continue
+        record = {"source": name, "id_prefix": chunk_id_prefix(path), "size": stat.st_size,
+                  "mtime": stat.st_mtime, "sha256": file_sha256(path), "settings": settings}
+        if incremental and entry and entry["sha256"] == record["sha256"]:
+            entry["mtime"] = stat.st_mtime
+            continue
+        changed[path] = record
+    removed = [path for path in manifest if os.path.dirname(path) == folder and path not in seen]
+    return changed, removed
+
+# Function to list the chunk ids a manifest record owns (records written before ids
+# carried a path hash used the bare filename)
+def chunk_ids(record, start=0):
+    prefix = record.get("id_prefix", record["source"])
+    return [f"{prefix}::{i}" for i in range(start, record.get("chunks", 0))]
+
+# Function to extract and chunk one PDF; runs inside a worker process
+def chunk_pdf(pdf_path, source, backend=PDF_BACKEND, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    pages = extract_pages_from_pdf(pdf_path, backend)
+    if not pages:
+        return None
+    return chunk_pages(pages, source, chunk_size, overlap, chunk_id_prefix(pdf_path))
+
+# Function to chunk many PDFs across CPU cores, yielding (source, chunks) as each file finishes.
+# Workers use the platform's default start method (fork on Linux), so they inherit the
+# parent's imported modules, including its Chroma client, which they never use.
+def chunk_pdfs_in_parallel(pdf_paths, backend=PDF_BACKEND, chunk_size=CHUNK_SIZE,
+                           overlap=CHUNK_OVERLAP, workers=INGEST_WORKERS):
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(chunk_pdf, pdf_path, source, backend, chunk_size, overlap): source
+            for source, pdf_path in pdf_paths
+        }
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result()
+            except Exception as e:
+                print(f"Error processing {futures[future]}: {str(e)}")
+                yield futures[future], None
+
+# Function to bring a collection in line with a folder, touching only the delta when incremental.
+# New and changed files are upserted, stale chunks and removed files are deleted.
+def ingest_folder(collection, folder_path, manifest_path, chunk_size=CHUNK_SIZE,
+                  overlap=CHUNK_OVERLAP, backend=PDF_BACKEND, batch_size=EMBED_BATCH_SIZE,
+                  incremental=True):
+    manifest = load_manifest(manifest_path)
+    settings = {"chunk_size": chunk_size, "overlap": overlap, "backend": backend}
+    changed, removed = plan_ingest(folder_path, manifest, settings, incremental)
+    print(f"{len(changed)} new or changed PDF files, {len(removed)} removed.")
+
+    for path in removed:
+        record = manifest.pop(path)
+        ids = chunk_ids(record)
+        if ids:
+            collection.delete(ids=ids)
+        print(f"Removed {record['source']} from collection '{collection.name}'")
+
+    # Files are extracted across worker processes and streamed in as each one finishes.
+    # Chunks from several files share a batch so small files do not pay per-call overhead.
+    paths_by_source = {record["source"]: path for path, record in changed.items()}
+    pending = []
+    written = 0
+    failed_sources = set()
+    chunked = {}
+    for source, chunks in chunk_pdfs_in_parallel(
+        list(paths_by_source.items()), backend, chunk_size, overlap
+    ):
+        if chunks is None:
+            failed_sources.add(source)
+            continue
+        chunked[source] = len(chunks)
+        pending.extend(chunks)
+        print(f"Chunked {source} into {len(chunks)} chunks")
+
+        ready = len(pending) - len(pending) % batch_size
+        count, failed = upsert_in_batches(collection, pending[:ready], batch_size)
+        written += count
+        failed_sources |= failed
+        pending = pending[ready:]
+
+    count, failed = upsert_in_batches(collection, pending, batch_size)
+    written += count
+    failed_sources |= failed
+
+    # Record only files whose chunks all landed; failures are retried on the next run
+    for source, chunk_count in chunked.items():
+        if source in failed_sources:
+            continue
+        path = paths_by_source[source]
+        previous = manifest.get(path)
+        record = dict(changed[path], chunks=chunk_count)
+        if previous and previous.get("id_prefix") == record["id_prefix"]:
+            stale_ids = chunk_ids(previous, start=chunk_count)
+        elif previous:
+            # The file was last chunked under ids without the path hash
+            stale_ids = chunk_ids(previous)
+        else:
+            # Older inserts stored each whole file under its bare filename
+            stale_ids = [source]
+        if stale_ids:
+            collection.delete(ids=stale_ids)
+        manifest[path] = record
+
+    save_manifest(manifest_path, manifest)
+    print(f"Wrote {written} chunks to collection '{collection.name}'.")
+    return written
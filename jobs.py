@@ -0,0 +1,371 @@
+import os
+import sys
+import json
+import time
+import uuid
+import sqlite3
+import argparse
+import threading
+import subprocess
+import multiprocessing
+from metrics import METRICS_PORT, start_metrics_server
+from response_cache import make_key
+
+# Durable background jobs for analysis, enhancement and DOCX export. Jobs live in a
+# SQLite table, so they survive browser reruns and disconnects; worker processes claim
+# them, report progress and partial output, and store the result for the UI to poll.
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "jobs.sqlite3")
+# Worker processes the app starts; set to 0 when a separate `python jobs.py` pool runs them
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "0.5"))
+JOB_HEARTBEAT_SECONDS = 5
+# A running job whose worker has not checked in for this long goes back in the queue
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Finished jobs are deleted after this long
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(24 * 3600)))
+# Partial output is written at most this often while a job streams
+PROGRESS_WRITE_SECONDS = 0.5
+# Tries, and the pause between them, for storing a job's outcome when the database is busy
+JOB_SETTLE_ATTEMPTS = 5
+JOB_SETTLE_RETRY_SECONDS = 1
+# Worker i serves /metrics on JOB_METRICS_PORT + i (0 turns it off)
+JOB_METRICS_PORT = int(os.getenv("JOB_METRICS_PORT", str(METRICS_PORT + 1 if METRICS_PORT else 0)))
+# Rough analysis length, used only to move the progress bar
+ANALYSIS_EXPECTED_CHARS = 2000
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class JobError(Exception):
+    pass
+
+
+# SQLite-backed job table shared by the app and the worker processes
+class JobStore:
+    def __init__(self, path=JOBS_DB_PATH):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            # Autocommit mode, so writes that must be atomic use explicit BEGIN IMMEDIATE
+            self._conn = sqlite3.connect(
+                self.path, timeout=30, check_same_thread=False, isolation_level=None
+            )
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, key TEXT NOT NULL, kind TEXT NOT NULL, "
+                "status TEXT NOT NULL, payload TEXT NOT NULL, progress REAL NOT NULL DEFAULT 0, "
+                "message TEXT, partial TEXT, result TEXT, result_blob BLOB, error TEXT, "
+                "attempts INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL, "
+                "updated_at REAL NOT NULL, heartbeat_at REAL)"
+            )
+            # At most one queued or running job per distinct input
+            self._conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS jobs_active_key ON jobs (key) "
+                "WHERE status IN ('queued', 'running')"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        return self._conn
+
+    # Function to queue a job, or return the id of the in-flight job with the same inputs
+    def submit(self, kind, payload):
+        key = make_key(json.dumps(payload, sort_keys=True), kind=kind)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE key = ? AND status IN ('queued', 'running')", (key,)
+                ).fetchone()
+                if row is not None:
+                    conn.execute("COMMIT")
+                    return row["id"]
+                job_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO jobs (id, key, kind, status, payload, message, created_at, updated_at) "
+                    "VALUES (?, ?, ?, 'queued', ?, 'Waiting for a worker', ?, ?)",
+                    (job_id, key, kind, json.dumps(payload), now, now),
+                )
+                conn.execute(
+                    "DELETE FROM jobs WHERE status NOT IN ('queued', 'running') AND updated_at < ?",
+                    (now - JOB_RETENTION_SECONDS,),
+                )
+                conn.execute("COMMIT")
+                return job_id
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        for field in ("payload", "partial", "result"):
+            if job[field] is not None:
+                job[field] = json.loads(job[field])
+        return job
+
+    # Function to take the oldest queued job, first requeueing jobs whose worker died
+    def claim(self):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                    "error = CASE WHEN attempts >= ? THEN 'Worker stopped responding' END, "
+                    "message = 'Worker stopped responding', updated_at = ? "
+                    "WHERE status = 'running' AND heartbeat_at < ?",
+                    (JOB_MAX_ATTEMPTS, JOB_MAX_ATTEMPTS, now, now - JOB_STALE_SECONDS),
+                )
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', attempts = attempts + 1, progress = 0, "
+                        "message = 'Started', partial = NULL, heartbeat_at = ?, updated_at = ? "
+                        "WHERE id = ?",
+                        (now, now, row["id"]),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return self.get(row["id"]) if row is not None else None
+
+    def _update(self, job_id, assignments, values):
+        now = time.time()
+        with self._lock:
+            self._connect().execute(
+                f"UPDATE jobs SET {assignments}, heartbeat_at = ?, updated_at = ? WHERE id = ?",
+                (*values, now, now, job_id),
+            )
+
+    def heartbeat(self, job_id):
+        self._update(job_id, "status = status", ())
+
+    def report(self, job_id, progress, message, partial=None):
+        self._update(job_id, "progress = ?, message = ?, partial = ?",
+                     (progress, message, json.dumps(partial) if partial is not None else None))
+
+    def finish(self, job_id, result, blob=None):
+        self._update(job_id, "status = 'done', progress = 1, message = 'Done', result = ?, result_blob = ?",
+                     (json.dumps(result), blob))
+
+    def fail(self, job_id, error):
+        self._update(job_id, "status = 'failed', message = 'Failed', error = ?", (error,))
+
+
+job_store = JobStore()
+
+
+# Function to stream the analysis, reporting the fields parsed so far
+def run_analysis(payload, report):
+    from engine import finish_analysis, new_analysis_parser, stream_analysis
+
+    parser = new_analysis_parser()
+    for chunk in stream_analysis(payload["resume_text"], payload["jd_text"]):
+        parser.feed(chunk)
+        report(min(0.95, len(parser.text) / ANALYSIS_EXPECTED_CHARS), "Analyzing", {
+            "score": parser.score, "strengths": parser.strengths, "improvements": parser.improvements,
+        })
+    if not parser.text:
+        raise JobError("The model returned an empty analysis.")
+    return finish_analysis(parser, payload["resume_text"], payload["jd_text"]), None
+
+
+# Function to stream the enhanced resume, reporting the text so far, then build its DOCX
+def run_enhancement(payload, report):
+    from docx_export import create_word_resume
+    from engine import stream_gemini_enhance_resume
+
+    reference_text = "N/A"
+    if payload.get("reference_collection"):
+        report(0, "Retrieving reference material")
+        from retrieval import retrieve_reference_text
+        try:
+            reference_text = retrieve_reference_text(
+                payload["reference_collection"], payload["jd_text"], payload["resume_text"]
+            )
+        except Exception as e:
+            # Same fallback as the app: enhance without references
+            print(f"Could not retrieve reference material: {e}")
+
+    chunks = []
+    expected = max(len(payload["resume_text"]), 1)
+    for chunk in stream_gemini_enhance_resume(payload["resume_text"], payload["jd_text"], reference_text):
+        chunks.append(chunk)
+        text = "".join(chunks)
+        report(min(0.9, len(text) / expected), "Enhancing", {"text": text})
+    enhanced_resume_text = "".join(chunks)
+    if not enhanced_resume_text:
+        raise JobError("The model returned an empty resume.")
+
+    report(0.95, "Building DOCX", {"text": enhanced_resume_text}, force=True)
+    return {"enhanced_resume": enhanced_resume_text}, create_word_resume(enhanced_resume_text)
+
+
+def run_export(payload, report):
+    from docx_export import create_word_resume
+
+    return {}, create_word_resume(payload["markdown"])
+
+
+JOB_HANDLERS = {"analyze": run_analysis, "enhance": run_enhancement, "export": run_export}
+
+
+# Function to run one claimed job, keeping its heartbeat fresh while it works
+def run_job(store, job):
+    job_id = job["id"]
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(JOB_HEARTBEAT_SECONDS):
+            store.heartbeat(job_id)
+
+    last_write = [0.0]
+
+    def report(progress, message, partial=None, force=False):
+        now = time.monotonic()
+        if force or now - last_write[0] >= PROGRESS_WRITE_SECONDS:
+            last_write[0] = now
+            store.report(job_id, progress, message, partial)
+
+    threading.Thread(target=beat, daemon=True).start()
+    try:
+        try:
+            result, blob = JOB_HANDLERS[job["kind"]](job["payload"], report)
+        except Exception as e:
+            _settle(store.fail, job_id, f"{type(e).__name__}: {e}")
+        else:
+            _settle(store.finish, job_id, result, blob)
+    finally:
+        stop.set()
+
+
+# Function to store a job's outcome, retrying while the database is locked. If it
+# still fails, the job's heartbeat stops and it is requeued once it goes stale.
+def _settle(write, job_id, *args):
+    for attempt in range(1, JOB_SETTLE_ATTEMPTS + 1):
+        try:
+            write(job_id, *args)
+            return
+        except sqlite3.Error as e:
+            print(f"Could not store the outcome of job {job_id} (try {attempt}): {e}")
+            if attempt < JOB_SETTLE_ATTEMPTS:
+                time.sleep(JOB_SETTLE_RETRY_SECONDS)
+
+
+# Worker process loop: claim, run, repeat; exits once the pool that started it is gone.
+# A database error never ends the loop, so the worker keeps taking jobs.
+def work(path=JOBS_DB_PATH, poll_seconds=JOB_POLL_SECONDS, metrics_port=0):
+    # Each worker serves its own /metrics, since stages run here rather than in the app
+    start_metrics_server(port=metrics_port)
+    store = JobStore(path)
+    parent_pid = os.getppid()
+    while os.getppid() == parent_pid:
+        try:
+            job = store.claim()
+            if job is not None:
+                run_job(store, job)
+                continue
+        except Exception as e:
+            print(f"Job worker error: {type(e).__name__}: {e}")
+        time.sleep(poll_seconds)
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# Function to run `count` worker processes until interrupted, or until `parent_pid` exits.
+# Worker i serves /metrics on metrics_port + i.
+def run_pool(count, path=JOBS_DB_PATH, parent_pid=None, metrics_port=JOB_METRICS_PORT):
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(
+            target=work, args=(path, JOB_POLL_SECONDS, metrics_port + i if metrics_port else 0), daemon=True
+        )
+        for i in range(count)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        while any(process.is_alive() for process in processes):
+            if parent_pid and not _process_alive(parent_pid):
+                break
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# Function to start the worker pool for this process, once (JOB_WORKERS=0 leaves it to
+# an external `python jobs.py` pool). The pool runs as a `python jobs.py` subprocess
+# because spawned workers re-import __main__, which under Streamlit is the app script.
+def start_job_workers(count=JOB_WORKERS, path=JOBS_DB_PATH):
+    global _pool
+    with _pool_lock:
+        if _pool is not None or count <= 0:
+            return _pool
+        _pool = subprocess.Popen([
+            sys.executable, os.path.abspath(__file__), "--workers", str(count), "--db", path,
+            "--parent-pid", str(os.getpid()), "--metrics-port", str(JOB_METRICS_PORT),
+        ])
+        return _pool
+
+
+def submit_analysis(resume_text, jd_text):
+    return job_store.submit("analyze", {"resume_text": resume_text, "jd_text": jd_text})
+
+
+def submit_enhancement(resume_text, jd_text, reference_collection=None):
+    return job_store.submit("enhance", {
+        "resume_text": resume_text, "jd_text": jd_text, "reference_collection": reference_collection,
+    })
+
+
+def submit_export(markdown_text):
+    return job_store.submit("export", {"markdown": markdown_text})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run background job workers.")
+    parser.add_argument("--workers", type=int, default=max(JOB_WORKERS, 1), help="Worker processes")
+    parser.add_argument("--db", default=JOBS_DB_PATH, help="Job database path")
+    parser.add_argument("--parent-pid", type=int, default=None,
+                        help="Stop when this process exits (set by the app)")
+    parser.add_argument("--metrics-port", type=int, default=JOB_METRICS_PORT,
+                        help="Worker i serves /metrics on this port + i (0 turns it off)")
+    args = parser.parse_args(argv)
+
+    print(f"{args.workers} job workers on {args.db}")
+    run_pool(args.workers, args.db, args.parent_pid, args.metrics_port)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+import os
+import sys
+import time
+import uuid
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from mock_llm_server import add_config_arguments, config_from_args, start_server
+
+# Headless load driver: each simulated session runs the single-resume flow of
+# app.py (extract, streamed analysis, streamed enhancement, DOCX export) without
+# the UI, so concurrency can be stepped up until throughput stops improving.
+
+SESSION_STEPS = ("extract", "analyze", "enhance", "docx")
+DEFAULT_LEVELS = "1,2,4,8,16"
+# A level counts as the ceiling once throughput gains fall below this fraction
+CEILING_GAIN = 0.10
+
+
+# Function to run one simulated session, returning per-step durations and any error
+def run_session(resume_data, resume_type, jd_text, salt, enhance):
+    # Imported here so environment set by main() is in place before clients exist
+    from docx_export import create_word_resume
+    from engine import finish_analysis, new_analysis_parser, stream_analysis, stream_gemini_enhance_resume
+    from extraction import extract_bytes
+
+    timings = {}
+    start = time.perf_counter()
+    try:
+        resume_text = extract_bytes(resume_data, resume_type)
+        timings["extract"] = time.perf_counter() - start
+
+        # A per-session salt keeps every session off the shared response cache
+        jd = f"{jd_text}\n{salt}" if salt else jd_text
+        step = time.perf_counter()
+        parser = new_analysis_parser()
+        for chunk in stream_analysis(resume_text, jd):
+            parser.feed(chunk)
+        finish_analysis(parser, resume_text, jd)
+        timings["analyze"] = time.perf_counter() - step
+
+        if enhance:
+            step = time.perf_counter()
+            enhanced = "".join(stream_gemini_enhance_resume(resume_text, jd, "N/A"))
+            timings["enhance"] = time.perf_counter() - step
+            step = time.perf_counter()
+            create_word_resume(enhanced)
+            timings["docx"] = time.perf_counter() - step
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    timings["total"] = time.perf_counter() - start
+    return timings, error
+
+
+# Function to run `sessions` sessions with `concurrency` at a time
+def run_level(concurrency, sessions, resumes, jd_text, enhance, use_cache):
+    results = []
+    lock = threading.Lock()
+
+    def task(i):
+        data, file_type = resumes[i % len(resumes)]
+        salt = None if use_cache else uuid.uuid4().hex
+        outcome = run_session(data, file_type, jd_text, salt, enhance)
+        with lock:
+            results.append(outcome)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(task, range(sessions)))
+    elapsed = time.perf_counter() - start
+    return results, elapsed
+
+
+def summarize(concurrency, results, elapsed):
+    from benchmark import percentile
+
+    ok = [timings for timings, error in results if not error]
+    summary = {
+        "concurrency": concurrency,
+        "sessions": len(results),
+        "errors": len(results) - len(ok),
+        "sessions_per_min": round(len(ok) / elapsed * 60, 1) if elapsed else 0.0,
+    }
+    for step in SESSION_STEPS + ("total",):
+        durations = sorted(timings[step] for timings in ok if step in timings)
+        if durations:
+            summary[f"{step}_p50_s"] = round(percentile(durations, 50), 3)
+            summary[f"{step}_p95_s"] = round(percentile(durations, 95), 3)
+    return summary
+
+
+def load_resumes(paths):
+    from batch_screen import collect_resume_paths
+    from extraction import PDF_TYPE
+
+    resumes = []
+    for path in collect_resume_paths(paths):
+        with open(path, "rb") as file:
+            resumes.append((file.read(), PDF_TYPE if path.lower().endswith(".pdf") else "text/plain"))
+    return resumes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Simulate concurrent app sessions to find the concurrency ceiling."
+    )
+    parser.add_argument("--resumes", nargs="+", default=["pdf"], help="Resume files or folders")
+    parser.add_argument("--jd", default=None, help="Job description file (default: a synthetic JD)")
+    parser.add_argument("--levels", default=DEFAULT_LEVELS,
+                        help="Comma-separated concurrency levels to step through")
+    parser.add_argument("--sessions", type=int, default=None,
+                        help="Sessions per level (default: 4 x concurrency)")
+    parser.add_argument("--no-enhance", action="store_true", help="Only run the analysis step")
+    parser.add_argument("--use-cache", action="store_true",
+                        help="Let sessions share the response cache instead of forcing provider calls")
+    parser.add_argument("--mock", action="store_true",
+                        help="Start mock_llm_server.py in-process and point both providers at it")
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.mock:
+        server = start_server(config_from_args(args))
+        os.environ["GROQ_BASE_URL"] = server.base_url
+        os.environ["GEMINI_BASE_URL"] = server.base_url
+        os.environ.setdefault("GROQ_API_KEY", "mock")
+        os.environ.setdefault("GEMINI_API_KEY", "mock")
+        # Keep canned responses out of the real response cache
+        os.environ.setdefault("RESPONSE_CACHE_PATH",
+                              os.path.join(tempfile.mkdtemp(), "load_test_cache.sqlite3"))
+        print(f"Mock LLM server on {server.base_url}")
+
+    from benchmark import synthetic_jd
+    from extraction import extract_path
+
+    resumes = load_resumes(args.resumes)
+    if not resumes:
+        print("No resume files found.")
+        return 1
+    jd_text = extract_path(args.jd) if args.jd else synthetic_jd()
+
+    summaries = []
+    for concurrency in [int(level) for level in args.levels.split(",") if level]:
+        sessions = args.sessions or concurrency * 4
+        results, elapsed = run_level(concurrency, sessions, resumes, jd_text, not args.no_enhance,
+                                     args.use_cache)
+        summary = summarize(concurrency, results, elapsed)
+        summaries.append(summary)
+        print(f"concurrency {concurrency:>3}: {summary['sessions_per_min']:>7} sessions/min  "
+              f"p50 {summary.get('total_p50_s', 'N/A')} s  p95 {summary.get('total_p95_s', 'N/A')} s  "
+              f"errors {summary['errors']}/{summary['sessions']}")
+        errors = [error for _, error in results if error]
+        if errors:
+            print(f"  first error: {errors[0]}")
+
+    ceiling = summaries[0]
+    for previous, current in zip(summaries, summaries[1:]):
+        if current["sessions_per_min"] < previous["sessions_per_min"] * (1 + CEILING_GAIN):
+            break
+        ceiling = current
+    print(f"\nThroughput stops scaling at about {ceiling['concurrency']} concurrent sessions "
+          f"({ceiling['sessions_per_min']} sessions/min).")
+    if server:
+        print(f"Mock server requests: {server.stats()}")
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,9 @@
 import os
+import sys
 import chromadb
 from chromadb.config import Settings
-import PyPDF2
 from pathlib import Path
+from ingest import CHUNK_SIZE, CHUNK_OVERLAP, EMBED_BATCH_SIZE, PDF_BACKEND, PDF_BACKENDS, ingest_folder
 
 # Create persist directory if it doesn't exist
 persist_directory = "chroma_db"
@@ -12,6 +13,10 @@ if not os.path.exists(persist_directory):
 # Initialize ChromaDB with the new configuration
 chroma_db = chromadb.PersistentClient(path=persist_directory)
 
+# Function to locate the ingest manifest kept for a collection
+def manifest_path_for(collection_name):
+    return os.path.join(persist_directory, "manifests", f"{collection_name}.json")
+
 # Function to display menu options
 def display_menu():
     print("\n=== ChromaDB Collection Manager ===")
@@ -57,24 +62,21 @@ def delete_collection():
         if 1 <= choice <= len(collections):
             collection_to_delete = collections[choice - 1]
             chroma_db.delete_collection(name=collection_to_delete.name)
+            manifest_path = manifest_path_for(collection_to_delete.name)
+            if os.path.exists(manifest_path):
+                os.remove(manifest_path)
             print(f"Collection '{collection_to_delete.name}' deleted successfully.")
         else:
             print("Invalid choice.")
     except ValueError:
         print("Please enter a valid number.")
 
-# Function to extract text from PDF
-def extract_text_from_pdf(pdf_path):
+# Function to read an integer setting, falling back to a default
+def input_int(prompt, default):
     try:
-        with open(pdf_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-            return text
-    except Exception as e:
-        print(f"Error extracting text from {pdf_path}: {str(e)}")
-        return None
+        return int(input(f"{prompt} (default: {default}): ") or default)
+    except ValueError:
+        return default
 
 # Function to insert files into collection
 def insert_files():
@@ -104,24 +106,24 @@ def insert_files():
         if not pdf_files:
             print("No PDF files found in the specified folder.")
             return
+
+        chunk_size = input_int("Enter chunk size in characters", CHUNK_SIZE)
+        overlap = input_int("Enter chunk overlap in characters", CHUNK_OVERLAP)
+        if not 0 <= overlap < chunk_size:
+            print("Overlap must be smaller than the chunk size.")
+            return
+        backend = input(f"Enter extraction backend {'/'.join(PDF_BACKENDS)} (default: {PDF_BACKEND}): ").strip().lower() or PDF_BACKEND
+        if backend not in PDF_BACKENDS:
+            print("Unknown extraction backend.")
+            return
+        incremental = input("Skip files unchanged since the last insert? (Y/n): ").strip().lower() != "n"
+        batch_size = min(EMBED_BATCH_SIZE, chroma_db.get_max_batch_size())
         
         print(f"Found {len(pdf_files)} PDF files. Processing...")
-        
-        for pdf_file in pdf_files:
-            pdf_path = os.path.join(folder_path, pdf_file)
-            text = extract_text_from_pdf(pdf_path)
-            
-            if text:
-                try:
-                    # Add the document to the collection
-                    collection.add(
-                        documents=[text],
-                        ids=[pdf_file]
-                    )
-                    print(f"Successfully added {pdf_file} to collection '{collection.name}'")
-                except Exception as e:
-                    print(f"Error adding {pdf_file} to collection: {str(e)}")
-        
+        ingest_folder(
+            collection, folder_path, manifest_path_for(collection.name),
+            chunk_size, overlap, backend, batch_size, incremental
+        )
         print("File insertion completed.")
         
     except ValueError:
@@ -170,11 +172,15 @@ def user_query():
         print("="*80 + "\n")
         
         if results and results['documents']:
-            for i, (doc, score, doc_id) in enumerate(zip(results['documents'][0], 
-                                                       results['distances'][0],
-                                                       results['ids'][0]), 1):
+            for i, (doc, score, doc_id, metadata) in enumerate(zip(results['documents'][0],
+                                                                 results['distances'][0],
+                                                                 results['ids'][0],
+                                                                 results['metadatas'][0]), 1):
                 print(f"\nResult {i}:")
-                print(f"Document: {doc_id}")
+                if metadata and "source" in metadata:
+                    print(f"Document: {metadata['source']} (page {metadata['page']})")
+                else:
+                    print(f"Document: {doc_id}")
                 print(f"Relevance Score: {1 - score:.4f}")
                 print("-"*40)
                 
@@ -219,8 +225,26 @@ def user_query():
     except Exception as e:
         print(f"Error during query: {str(e)}")
 
+# Function to sync a folder into a collection without prompts (e.g. from a nightly job)
+def sync_folder(collection_name, folder_path):
+    try:
+        collection = chroma_db.get_collection(name=collection_name)
+    except Exception as e:
+        print(f"Error opening collection '{collection_name}': {str(e)}")
+        return 1
+    if not os.path.isdir(folder_path):
+        print("Folder path does not exist.")
+        return 1
+    batch_size = min(EMBED_BATCH_SIZE, chroma_db.get_max_batch_size())
+    ingest_folder(collection, folder_path, manifest_path_for(collection_name), batch_size=batch_size)
+    return 0
+
 # Main function to handle user input
 def main():
+    # python manage_collection.py sync <collection> <folder>
+    if len(sys.argv) == 4 and sys.argv[1] == "sync":
+        sys.exit(sync_folder(sys.argv[2], sys.argv[3]))
+
     while True:
         display_menu()
         choice = input("Enter your choice: ")
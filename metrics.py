@@ -0,0 +1,301 @@
+import os
+import time
+import bisect
+import functools
+import threading
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Per-stage timing, sizes, token usage, cache hits and errors, exposed in the
+# Prometheus text format on a local /metrics endpoint. Spans are also exported
+# over OTLP when OTEL_EXPORTER_OTLP_ENDPOINT is set and the exporter is installed.
+
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+# Set METRICS_PORT=0 to turn the endpoint off
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "resume-enhancer")
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def samples(self):
+        with self._lock:
+            return [
+                f"{self.name}{_label_text(self.labels, key)} {value}" for key, value in self._values.items()
+            ]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (+Inf last), sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            entry = self._values.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0, 0])
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        lines = []
+        with self._lock:
+            for key, (bucket_counts, total, count) in self._values.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + ("+Inf",), bucket_counts):
+                    cumulative += bucket_count
+                    labels = _label_text(self.labels, key, [("le", bound)])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {total}")
+                lines.append(f"{self.name}_count{_label_text(self.labels, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    # Function to render every metric in the Prometheus text exposition format
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+stage_duration = metrics.register(Histogram(
+    "resume_stage_duration_seconds", "Time spent in each pipeline stage", ("stage",)
+))
+stream_first_chunk = metrics.register(Histogram(
+    "resume_stream_first_chunk_seconds", "Time until a streamed stage produced its first chunk", ("stage",)
+))
+stage_input_bytes = metrics.register(Histogram(
+    "resume_stage_input_bytes", "Input size of each pipeline stage", ("stage",), SIZE_BUCKETS
+))
+stage_output_bytes = metrics.register(Histogram(
+    "resume_stage_output_bytes", "Output size of each pipeline stage", ("stage",), SIZE_BUCKETS
+))
+stage_errors = metrics.register(Counter(
+    "resume_stage_errors_total", "Pipeline stage calls that raised", ("stage", "error")
+))
+llm_tokens = metrics.register(Counter(
+    "resume_llm_tokens_total", "Tokens reported by the LLM providers", ("provider", "type")
+))
+cache_requests = metrics.register(Counter(
+    "resume_cache_requests_total", "Cache lookups by cache and result", ("cache", "result")
+))
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+_tracer_ready = False
+
+
+# Function to set up OTLP span export once, or return None when it is not configured
+def get_tracer():
+    global _tracer, _tracer_ready
+    with _tracer_lock:
+        if _tracer_ready:
+            return _tracer
+        _tracer_ready = True
+        if not OTLP_ENDPOINT:
+            return None
+        try:
+            from opentelemetry import trace
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            print("OTEL_EXPORTER_OTLP_ENDPOINT is set but opentelemetry-sdk and "
+                  "opentelemetry-exporter-otlp-proto-http are not installed; traces are off.")
+            return None
+        provider = TracerProvider(resource=Resource.create({"service.name": SERVICE_NAME}))
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        trace.set_tracer_provider(provider)
+        _tracer = trace.get_tracer("resume_enhancer")
+        return _tracer
+
+
+def size_of(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+
+# Handle for the stage being tracked; lets the caller report output and stream progress
+class StageRecord:
+    def __init__(self, stage, span, start):
+        self.stage = stage
+        self.span = span
+        self.start = start
+        self.output_size = 0
+        self._first_chunk_seen = False
+
+    def set_output(self, value):
+        self.output_size = size_of(value) or 0
+
+    # Function to record a streamed chunk, timing the first one
+    def add_chunk(self, chunk):
+        if not self._first_chunk_seen:
+            self._first_chunk_seen = True
+            elapsed = time.perf_counter() - self.start
+            stream_first_chunk.observe(elapsed, stage=self.stage)
+            if self.span is not None:
+                self.span.add_event("first_chunk")
+        self.output_size += size_of(chunk) or 0
+
+    def set_attribute(self, name, value):
+        if self.span is not None:
+            self.span.set_attribute(name, value)
+
+
+# Context manager that times a stage and records its sizes, errors and span. Pass
+# streaming=True inside generators: they can be resumed from other threads and contexts
+# (a thread pool, a shared stream's reader), and a span made current there would be
+# detached in a different context, so their span is started without becoming current.
+@contextmanager
+def track(stage, input_value=None, streaming=False):
+    tracer = get_tracer()
+    if tracer is None:
+        span_context = nullcontext()
+    elif streaming:
+        span_context = tracer.start_span(stage)
+    else:
+        span_context = tracer.start_as_current_span(stage)
+    with span_context as span:
+        record = StageRecord(stage, span, time.perf_counter())
+        input_size = size_of(input_value)
+        if input_size is not None:
+            stage_input_bytes.observe(input_size, stage=stage)
+            record.set_attribute("input_bytes", input_size)
+        try:
+            yield record
+        except GeneratorExit:
+            # A consumer stopping a stream early is not an error
+            raise
+        except Exception as e:
+            stage_errors.inc(stage=stage, error=type(e).__name__)
+            record.set_attribute("error", type(e).__name__)
+            raise
+        finally:
+            stage_duration.observe(time.perf_counter() - record.start, stage=stage)
+            if record.output_size:
+                stage_output_bytes.observe(record.output_size, stage=stage)
+                record.set_attribute("output_bytes", record.output_size)
+
+
+# Decorator form of track() for functions whose first argument is the stage input
+def instrument(stage):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with track(stage, args[0] if args else None) as record:
+                result = fn(*args, **kwargs)
+                record.set_output(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def record_tokens(provider, prompt_tokens, completion_tokens):
+    if prompt_tokens:
+        llm_tokens.inc(prompt_tokens, provider=provider, type="prompt")
+    if completion_tokens:
+        llm_tokens.inc(completion_tokens, provider=provider, type="completion")
+
+
+def record_cache(cache, hit):
+    cache_requests.inc(cache=cache, result="hit" if hit else "miss")
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_attempted = False
+_server_lock = threading.Lock()
+
+
+# Function to serve /metrics on a background thread, once per process
+def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    global _server, _server_attempted
+    with _server_lock:
+        if _server_attempted or not port:
+            return _server
+        _server_attempted = True
+        try:
+            _server = ThreadingHTTPServer((host, port), MetricsHandler)
+        except OSError as e:
+            # Another process (e.g. a second app instance) may already own the port
+            print(f"Metrics endpoint not started on {host}:{port}: {e}")
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, daemon=True).start()
+        return _server
@@ -0,0 +1,350 @@
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for the Groq chat-completions and Gemini generateContent APIs,
+# including streaming, with configurable latency, error rate and canned responses.
+# Point the app at it with GROQ_BASE_URL and GEMINI_BASE_URL.
+
+MOCK_HOST = os.getenv("MOCK_HOST", "127.0.0.1")
+MOCK_PORT = int(os.getenv("MOCK_PORT", "8090"))
+RESPONSES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "fixtures")
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+
+GROQ_COMPLETIONS_PATH = "/openai/v1/chat/completions"
+GROQ_MODEL_PATH = re.compile(r"^/openai/v1/models/(?P<model>[^/?]+)")
+GEMINI_PATH = re.compile(r"^/v1beta/models/(?P<model>[^/:?]+)(?::(?P<method>\w+))?")
+
+GEMINI_ERROR_STATUS = {429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE", 504: "DEADLINE_EXCEEDED"}
+
+
+# Latency, error and streaming behaviour shared by both mock APIs
+class MockConfig:
+    def __init__(self, latency="lognormal", latency_ms=800.0, latency_spread=0.5, tokens_per_sec=200.0,
+                 chunk_chars=40, error_rate=0.0, error_statuses=(429, 503), retry_after=1,
+                 responses_dir=RESPONSES_DIR, seed=None):
+        self.latency = latency
+        self.latency_ms = latency_ms
+        self.latency_spread = latency_spread
+        self.tokens_per_sec = tokens_per_sec
+        self.chunk_chars = chunk_chars
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.retry_after = retry_after
+        self.responses = load_responses(responses_dir)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    # Function to sample the delay before the first byte, in seconds
+    def first_byte_delay(self):
+        with self._lock:
+            if self.latency == "uniform":
+                spread = self.latency_ms * self.latency_spread
+                delay_ms = self._random.uniform(self.latency_ms - spread, self.latency_ms + spread)
+            elif self.latency == "lognormal":
+                # latency_ms is the median; latency_spread is sigma, giving a long tail
+                delay_ms = self._random.lognormvariate(0, self.latency_spread) * self.latency_ms
+            else:
+                delay_ms = self.latency_ms
+        return max(0.0, delay_ms) / 1000
+
+    # Function to pick an error status for this request, or None
+    def sample_error(self):
+        with self._lock:
+            if self.error_rate and self._random.random() < self.error_rate:
+                return self._random.choice(self.error_statuses)
+        return None
+
+    # Function to pick the canned response that fits a prompt
+    def response_for(self, prompt, json_mode=False):
+        lowered = prompt.lower()
+        if json_mode:
+            return self.responses["analysis_json"]
+        if "resume writer" in lowered or "enhanced full resume" in lowered:
+            return self.responses["enhance"]
+        if "recruiter" in lowered:
+            return self.responses["analysis"]
+        return self.responses["default"]
+
+    # Function to split a response into stream chunks, each with the delay before it
+    def stream_chunks(self, text):
+        chunks = [text[start:start + self.chunk_chars] for start in range(0, len(text), self.chunk_chars)]
+        delay = (self.chunk_chars / 4 / self.tokens_per_sec) if self.tokens_per_sec > 0 else 0.0
+        return [(chunk, delay) for chunk in chunks]
+
+    # Function to estimate the generation time of a whole non-streamed response
+    def generation_time(self, text):
+        return (len(text) / 4 / self.tokens_per_sec) if self.tokens_per_sec > 0 else 0.0
+
+
+def load_responses(responses_dir):
+    def read(name, fallback):
+        path = os.path.join(responses_dir, name)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                return file.read()
+        return fallback
+
+    return {
+        "analysis": read("analysis.txt", "Compatibility Score: 70/100\n\nStrengths:\n- Mock\n\nGaps:\n- Mock"),
+        "analysis_json": read("analysis.json", json.dumps({
+            "score": 70, "summary": "Mock", "strengths": ["Mock"], "gaps": ["Mock"],
+            "matched_keywords": [], "missing_keywords": [],
+        })),
+        "enhance": read("enhanced_resume.md", "# Mock Resume\n\n- Mock bullet"),
+        "default": "This is a mock response.",
+    }
+
+
+# Function to estimate tokens the way the providers report usage
+def usage_tokens(text):
+    return max(1, len(text) // 4)
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockLLM/1.0"
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.record(self.path, status)
+
+    def _start_stream(self, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+    def _write_chunk(self, data):
+        data = data.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+        self.server.record(self.path, 200)
+
+    def do_GET(self):
+        if self.path.startswith("/stats"):
+            return self._send_json(200, self.server.stats())
+        groq_match = GROQ_MODEL_PATH.match(self.path)
+        if groq_match:
+            return self._send_json(200, {"id": groq_match["model"], "object": "model", "owned_by": "mock"})
+        gemini_match = GEMINI_PATH.match(self.path)
+        if gemini_match and not gemini_match["method"]:
+            return self._send_json(200, {
+                "name": f"models/{gemini_match['model']}", "displayName": gemini_match["model"],
+                "supportedGenerationMethods": ["generateContent", "streamGenerateContent"],
+            })
+        self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        request = self._read_json()
+        if self.path.startswith(GROQ_COMPLETIONS_PATH):
+            return self._groq_completion(request)
+        gemini_match = GEMINI_PATH.match(self.path)
+        if gemini_match and gemini_match["method"] in ("generateContent", "streamGenerateContent"):
+            return self._gemini_generate(request, gemini_match["model"],
+                                         gemini_match["method"] == "streamGenerateContent")
+        self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    # Function to sleep the first-byte delay, then send an injected error if one is due
+    def _delay_or_fail(self, error_payload):
+        time.sleep(self.config.first_byte_delay())
+        status = self.config.sample_error()
+        if status is None:
+            return False
+        headers = {"Retry-After": str(self.config.retry_after)} if status == 429 else None
+        self._send_json(status, error_payload(status), headers)
+        return True
+
+    def _groq_completion(self, request):
+        def error_payload(status):
+            return {"error": {"message": f"Mock error {status}", "type": "mock_error", "code": str(status)}}
+
+        if self._delay_or_fail(error_payload):
+            return
+        prompt = "\n".join(message.get("content", "") for message in request.get("messages", []))
+        json_mode = (request.get("response_format") or {}).get("type") == "json_object"
+        text = self.config.response_for(prompt, json_mode)
+        model = request.get("model", "mock")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        usage = {"prompt_tokens": usage_tokens(prompt), "completion_tokens": usage_tokens(text)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        if not request.get("stream"):
+            time.sleep(self.config.generation_time(text))
+            return self._send_json(200, {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        def event(delta, finish_reason=None, extra=None):
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                       "model": model,
+                       "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            payload.update(extra or {})
+            return f"data: {json.dumps(payload)}\n\n"
+
+        self._start_stream("text/event-stream")
+        self._write_chunk(event({"role": "assistant", "content": ""}))
+        for chunk, delay in self.config.stream_chunks(text):
+            time.sleep(delay)
+            self._write_chunk(event({"content": chunk}))
+        self._write_chunk(event({}, "stop", {"x_groq": {"usage": usage}}))
+        self._write_chunk("data: [DONE]\n\n")
+        self._end_stream()
+
+    def _gemini_generate(self, request, model, stream):
+        def error_payload(status):
+            return {"error": {"code": status, "message": f"Mock error {status}",
+                              "status": GEMINI_ERROR_STATUS.get(status, "UNKNOWN")}}
+
+        if self._delay_or_fail(error_payload):
+            return
+        prompt = "\n".join(
+            part.get("text", "")
+            for content in request.get("contents", []) for part in content.get("parts", [])
+        )
+        json_mode = (request.get("generationConfig") or {}).get("responseMimeType") == "application/json"
+        text = self.config.response_for(prompt, json_mode)
+
+        def response(chunk, finished):
+            payload = {"candidates": [{"content": {"parts": [{"text": chunk}], "role": "model"}, "index": 0}],
+                       "modelVersion": model}
+            if finished:
+                payload["candidates"][0]["finishReason"] = "STOP"
+                payload["usageMetadata"] = {
+                    "promptTokenCount": usage_tokens(prompt), "candidatesTokenCount": usage_tokens(text),
+                    "totalTokenCount": usage_tokens(prompt) + usage_tokens(text),
+                }
+            return payload
+
+        if not stream:
+            time.sleep(self.config.generation_time(text))
+            return self._send_json(200, response(text, True))
+
+        # The REST transport reads a streamed JSON array of responses
+        self._start_stream("application/json")
+        chunks = self.config.stream_chunks(text)
+        for i, (chunk, delay) in enumerate(chunks):
+            time.sleep(delay)
+            separator = "[" if i == 0 else ",\r\n"
+            self._write_chunk(separator + json.dumps(response(chunk, i == len(chunks) - 1)))
+        self._write_chunk("]" if chunks else "[]")
+        self._end_stream()
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config, verbose=False):
+        super().__init__(address, MockLLMHandler)
+        self.config = config
+        self.verbose = verbose
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, path, status):
+        provider = "groq" if path.startswith("/openai/") else "gemini" if path.startswith("/v1beta/") else "other"
+        with self._lock:
+            self._counts[f"{provider} {status}"] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+# Function to start a mock server on a background thread (port 0 picks a free port)
+def start_server(config, host=MOCK_HOST, port=0, verbose=False):
+    server = MockLLMServer((host, port), config, verbose)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_config_arguments(parser):
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default="lognormal",
+                        help="Distribution of the delay before the first byte")
+    parser.add_argument("--latency-ms", type=float, default=800.0,
+                        help="Fixed/mean (uniform) or median (lognormal) first-byte delay")
+    parser.add_argument("--latency-spread", type=float, default=0.5,
+                        help="Uniform: +/- fraction of latency-ms. Lognormal: sigma")
+    parser.add_argument("--tokens-per-sec", type=float, default=200.0,
+                        help="Generation speed after the first byte (0 for instant)")
+    parser.add_argument("--chunk-chars", type=int, default=40, help="Characters per streamed chunk")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--error-statuses", default="429,503", help="Comma-separated statuses to inject")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--responses", default=RESPONSES_DIR,
+                        help="Folder with analysis.txt and enhanced_resume.md canned responses")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for repeatable runs")
+
+
+def config_from_args(args):
+    return MockConfig(
+        latency=args.latency, latency_ms=args.latency_ms, latency_spread=args.latency_spread,
+        tokens_per_sec=args.tokens_per_sec, chunk_chars=args.chunk_chars, error_rate=args.error_rate,
+        error_statuses=[int(status) for status in args.error_statuses.split(",") if status],
+        retry_after=args.retry_after, responses_dir=args.responses, seed=args.seed,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mock Groq and Gemini APIs for load testing.")
+    parser.add_argument("--host", default=MOCK_HOST)
+    parser.add_argument("--port", type=int, default=MOCK_PORT)
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log every request")
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = MockLLMServer((args.host, args.port), config_from_args(args), args.verbose)
+    print(f"Mock LLM server on {server.base_url}")
+    print(f"  GROQ_BASE_URL={server.base_url} GEMINI_BASE_URL={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+import os
+import time
+import threading
+from groq import Groq
+import google.generativeai as genai
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+GROQ_MODEL = "llama3-70b-8192"
+GEMINI_MODEL = "gemini-1.5-pro"
+
+# Per-request timeouts in seconds (override via environment)
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "60"))
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "120"))
+
+
+# Optional API endpoints (e.g. mock_llm_server.py for load tests), read when the
+# clients are created so a test driver can set them before the first call
+def groq_base_url():
+    return os.getenv("GROQ_BASE_URL") or None
+
+
+def gemini_base_url():
+    return os.getenv("GEMINI_BASE_URL") or None
+
+
+# Process-wide provider clients, created on first use and shared by every session.
+# Reusing one Groq client keeps its HTTP connection pool warm between requests.
+class ProviderRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._groq = None
+        self._gemini_configured = False
+        self._gemini_models = {}
+
+    def groq(self):
+        with self._lock:
+            if self._groq is None:
+                # Retries are handled by resilience.py, not the SDK
+                self._groq = Groq(api_key=os.getenv("GROQ_API_KEY"), base_url=groq_base_url(),
+                                  timeout=GROQ_TIMEOUT, max_retries=0)
+            return self._groq
+
+    def gemini(self, model_name=GEMINI_MODEL):
+        with self._lock:
+            if not self._gemini_configured:
+                base_url = gemini_base_url()
+                if base_url:
+                    # Custom endpoints are plain HTTP, so use the REST transport instead of gRPC
+                    genai.configure(api_key=os.getenv("GEMINI_API_KEY"), transport="rest",
+                                    client_options={"api_endpoint": base_url})
+                else:
+                    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+                self._gemini_configured = True
+            if model_name not in self._gemini_models:
+                self._gemini_models[model_name] = genai.GenerativeModel(model_name)
+            return self._gemini_models[model_name]
+
+    # Create every client up front; with connect=True also open provider connections
+    def warm_up(self, connect=False):
+        self.groq()
+        self.gemini()
+        if connect:
+            return self.health()
+        return None
+
+    # Make a lightweight authenticated call to each provider and time it
+    def health(self):
+        checks = {
+            "groq": lambda: self.groq().models.retrieve(GROQ_MODEL),
+            "gemini": lambda: (self.gemini(), genai.get_model(f"models/{GEMINI_MODEL}")),
+        }
+        status = {}
+        for name, check in checks.items():
+            start = time.perf_counter()
+            try:
+                check()
+                status[name] = {"ok": True, "latency_ms": round((time.perf_counter() - start) * 1000)}
+            except Exception as e:
+                status[name] = {"ok": False, "error": str(e)}
+        return status
+
+
+registry = ProviderRegistry()
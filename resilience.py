@@ -0,0 +1,248 @@
+import os
+import time
+import random
+import threading
+import groq
+from google.api_core import exceptions as google_exceptions
+
+# Shared call layer for LLM providers: token-bucket rate limiting, jittered
+# exponential backoff that honors Retry-After, a circuit breaker per provider,
+# and ordered cross-provider fallback.
+
+# Errors worth retrying on the same provider; anything else goes straight to fallback
+RETRYABLE_ERRORS = (
+    groq.RateLimitError,
+    groq.APITimeoutError,
+    groq.APIConnectionError,
+    groq.InternalServerError,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+    google_exceptions.BadGateway,
+    google_exceptions.GatewayTimeout,
+    TimeoutError,
+    ConnectionError,
+)
+
+
+class RateLimitedError(Exception):
+    pass
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class AllProvidersFailedError(Exception):
+    pass
+
+
+# Token bucket: `rate` tokens per second, bursts of up to `capacity`; a rate of 0
+# means no limit
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, max_wait):
+        if self.rate <= 0:
+            return
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                raise RateLimitedError("Local rate limit reached")
+            time.sleep(wait)
+
+
+# Opens after `failure_threshold` consecutive failures and lets one trial call
+# through once `reset_timeout` seconds have passed
+class CircuitBreaker:
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return "open"
+            return "half-open"
+
+
+# Function to read a Retry-After header (in seconds) from a provider error, if present
+def retry_after_seconds(error):
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+# Retry, rate-limit and circuit-breaker policy for one provider
+class ResilientProvider:
+    def __init__(self, name, requests_per_minute=60, burst=5, max_retries=3, base_delay=1.0,
+                 max_delay=20.0, max_queue_wait=30.0, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_queue_wait = max_queue_wait
+
+    def _before_attempt(self):
+        # Take a token first so a half-open trial is only granted to a call that will run
+        self.bucket.acquire(self.max_queue_wait)
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open after repeated failures")
+
+    # Function to pick the wait before the next attempt, or None to stop retrying
+    def _retry_delay(self, error, attempt):
+        if attempt >= self.max_retries or not isinstance(error, RETRYABLE_ERRORS):
+            return None
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            # A long server-requested wait is better spent on the fallback provider
+            return retry_after if retry_after <= self.max_delay else None
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    # Function to update the breaker after a failed attempt. Only transport errors,
+    # timeouts, 429s and 5xxs count against the provider; a bad request, auth error
+    # or safety block is the request's fault, and the provider did answer.
+    def _record_error(self, error):
+        if isinstance(error, RETRYABLE_ERRORS):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def call(self, fn, *args):
+        attempt = 0
+        while True:
+            self._before_attempt()
+            try:
+                result = fn(*args)
+            except Exception as e:
+                self._record_error(e)
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    # Streams are only retried before the first chunk; partial output cannot be replayed
+    def stream(self, fn, *args):
+        attempt = 0
+        while True:
+            self._before_attempt()
+            started = False
+            try:
+                for chunk in fn(*args):
+                    started = True
+                    yield chunk
+            except GeneratorExit:
+                # The consumer stopped early; the provider itself was healthy
+                self.breaker.record_success()
+                raise
+            except Exception as e:
+                self._record_error(e)
+                delay = None if started else self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return
+
+
+def _policy_from_env(name, requests_per_minute):
+    prefix = name.upper()
+    return ResilientProvider(
+        name,
+        requests_per_minute=float(os.getenv(f"{prefix}_REQUESTS_PER_MINUTE", str(requests_per_minute))),
+        burst=int(os.getenv(f"{prefix}_BURST", "5")),
+        max_retries=int(os.getenv(f"{prefix}_MAX_RETRIES", "3")),
+        max_delay=float(os.getenv(f"{prefix}_MAX_RETRY_DELAY", "20")),
+        failure_threshold=int(os.getenv(f"{prefix}_CIRCUIT_FAILURES", "5")),
+        reset_timeout=float(os.getenv(f"{prefix}_CIRCUIT_RESET", "30")),
+    )
+
+
+policies = {
+    "groq": _policy_from_env("groq", 30),
+    "gemini": _policy_from_env("gemini", 15),
+}
+
+
+# Function to try each (provider name, fn, args) in order until one succeeds
+def call_with_fallback(attempts):
+    errors = []
+    for name, fn, args in attempts:
+        try:
+            return policies[name].call(fn, *args)
+        except Exception as e:
+            errors.append(f"{name}: {e}")
+    raise AllProvidersFailedError("; ".join(errors))
+
+
+# Function to stream from the first provider that starts producing output
+def stream_with_fallback(attempts):
+    errors = []
+    for name, fn, args in attempts:
+        started = False
+        try:
+            for chunk in policies[name].stream(fn, *args):
+                started = True
+                yield chunk
+            return
+        except Exception as e:
+            if started:
+                raise
+            errors.append(f"{name}: {e}")
+    raise AllProvidersFailedError("; ".join(errors))
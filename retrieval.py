@@ -0,0 +1,154 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import chromadb
+from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+from compaction import count_tokens
+
+# Retrieval settings (override via environment)
+CHROMA_PATH = os.getenv("CHROMA_PATH", "chroma_db")
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "8"))
+REFERENCE_TOKEN_BUDGET = int(os.getenv("REFERENCE_TOKEN_BUDGET", "1500"))
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "256"))
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", "3600"))
+
+# The embedding model only reads the start of a query, so longer text is wasted work
+QUERY_MAX_CHARS = 2000
+
+
+# Small thread-safe LRU cache with a time-to-live
+class LRUCache:
+    def __init__(self, max_entries=QUERY_CACHE_MAX_ENTRIES, ttl=QUERY_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+embedding_cache = LRUCache()
+result_cache = LRUCache()
+
+_client = None
+_embedding_function = None
+_client_lock = threading.Lock()
+
+
+# Function to open the Chroma client once per process
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = chromadb.PersistentClient(path=CHROMA_PATH)
+        return _client
+
+
+# Function to load the query embedding model once per process
+def get_embedding_function():
+    global _embedding_function
+    with _client_lock:
+        if _embedding_function is None:
+            # Same default embedding model the collections are built with
+            _embedding_function = DefaultEmbeddingFunction()
+        return _embedding_function
+
+
+# Function to list the collections available as reference material
+def list_collection_names():
+    return sorted(collection.name for collection in get_client().list_collections())
+
+
+def _text_key(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# Function to embed query texts, reusing cached embeddings
+def embed_queries(texts):
+    texts = [text[:QUERY_MAX_CHARS] for text in texts]
+    keys = [_text_key(text) for text in texts]
+    embeddings = [embedding_cache.get(key) for key in keys]
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if missing:
+        computed = get_embedding_function()([texts[i] for i in missing])
+        for i, embedding in zip(missing, computed):
+            embeddings[i] = [float(value) for value in embedding]
+            embedding_cache.put(keys[i], embeddings[i])
+    return embeddings
+
+
+# Function to find the chunks closest to the JD and resume, best first and de-duplicated
+def query_reference_chunks(collection_name, jd_text, resume_text, top_k=RETRIEVAL_TOP_K):
+    queries = [text for text in (jd_text, resume_text) if text and text.strip()]
+    if not queries:
+        return []
+    cache_key = (collection_name, top_k) + tuple(_text_key(text[:QUERY_MAX_CHARS]) for text in queries)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    collection = get_client().get_collection(name=collection_name)
+    results = collection.query(
+        query_embeddings=embed_queries(queries),
+        n_results=top_k,
+        include=["documents", "metadatas", "distances"]
+    )
+
+    best = {}
+    for ids, documents, metadatas, distances in zip(
+        results["ids"], results["documents"], results["metadatas"], results["distances"]
+    ):
+        for chunk_id, document, metadata, distance in zip(ids, documents, metadatas, distances):
+            if chunk_id not in best or distance < best[chunk_id]["distance"]:
+                best[chunk_id] = {"id": chunk_id, "text": document, "metadata": metadata or {},
+                                  "distance": distance}
+    chunks = sorted(best.values(), key=lambda chunk: chunk["distance"])[:top_k]
+    result_cache.put(cache_key, chunks)
+    return chunks
+
+
+# Function to join the best chunks into reference text that fits the token budget
+def build_reference_text(chunks, token_budget=REFERENCE_TOKEN_BUDGET):
+    parts = []
+    used = 0
+    for chunk in chunks:
+        metadata = chunk["metadata"]
+        label = metadata.get("source", chunk["id"])
+        if "page" in metadata:
+            label = f"{label}, page {metadata['page']}"
+        part = f"[{label}]\n{chunk['text'].strip()}"
+        tokens = count_tokens(part)
+        if used + tokens > token_budget:
+            break
+        parts.append(part)
+        used += tokens
+    return "\n\n".join(parts)
+
+
+# Function to retrieve reference material for the enhancement prompt, or "N/A"
+def retrieve_reference_text(collection_name, jd_text, resume_text,
+                            top_k=RETRIEVAL_TOP_K, token_budget=REFERENCE_TOKEN_BUDGET):
+    if not collection_name:
+        return "N/A"
+    chunks = query_reference_chunks(collection_name, jd_text, resume_text, top_k)
+    return build_reference_text(chunks, token_budget) or "N/A"
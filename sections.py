@@ -0,0 +1,31 @@
+import re
+
+# Splitting the enhanced resume markdown into sections so each one can be
+# rewritten, cached and rendered on its own
+
+# Level 1 and 2 headings start a section; deeper headings (e.g. a job title) stay inside it
+SECTION_HEADING = re.compile(r"^#{1,2}\s+(.*\S)\s*$")
+
+
+# Function to split markdown into sections; text before the first heading is its own section
+def split_sections(markdown_text):
+    sections = []
+    current = []
+    for line in (markdown_text or "").split("\n"):
+        if SECTION_HEADING.match(line) and any(part.strip() for part in current):
+            sections.append("\n".join(current).strip("\n"))
+            current = []
+        current.append(line)
+    if any(part.strip() for part in current):
+        sections.append("\n".join(current).strip("\n"))
+    return sections
+
+
+def join_sections(sections):
+    return "\n\n".join(section.strip("\n") for section in sections if section.strip())
+
+
+# Function to name a section by its heading
+def section_title(section_text):
+    match = SECTION_HEADING.match(section_text.split("\n", 1)[0])
+    return match.group(1).strip("*_ ") if match else "Header"
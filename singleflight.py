@@ -0,0 +1,136 @@
+import threading
+from metrics import record_cache
+
+# Coalesces identical concurrent work within one process: while a call for a key is in
+# flight, other callers with the same key wait for it and share its result (or its
+# error) instead of repeating the provider request. Nothing is kept once the call
+# finishes; the response cache covers repeats over time. Work in other processes (e.g.
+# separate job workers) is not shared; the job store dedupes identical jobs instead.
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# A stream shared by every caller of one key. Whichever caller needs the next chunk
+# pulls it from the source, so the stream keeps going if the first caller stops early.
+class _SharedStream:
+    def __init__(self, source):
+        self.source = source
+        self.chunks = []
+        self.finished = False
+        self.error = None
+        self.readers = 0
+        self.pulling = False
+        self.condition = threading.Condition()
+
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    # Function to run fn(*args) once per key at a time, sharing the outcome
+    def do(self, key, fn, *args):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        record_cache(self.name, not leader)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    # Function to yield the chunks of fn(*args), sharing one source stream per key. The
+    # reader joins on its first next(), in the same frame whose finally leaves, so a
+    # stream that is never iterated never registers.
+    def stream(self, key, fn, *args):
+        with self._lock:
+            shared = self._streams.get(key)
+            joined = shared is not None
+            if not joined:
+                shared = self._streams[key] = _SharedStream(fn(*args))
+            with shared.condition:
+                shared.readers += 1
+        try:
+            record_cache(self.name, joined)
+            yield from self._read(key, shared)
+        finally:
+            self._leave(key, shared)
+
+    def _read(self, key, shared):
+        position = 0
+        while True:
+            with shared.condition:
+                while position == len(shared.chunks) and not shared.finished and shared.pulling:
+                    shared.condition.wait()
+                if position < len(shared.chunks):
+                    chunk = shared.chunks[position]
+                    position += 1
+                elif shared.finished:
+                    if shared.error is not None:
+                        raise shared.error
+                    return
+                else:
+                    shared.pulling = True
+                    chunk = None
+            if chunk is not None:
+                yield chunk
+                continue
+            self._pull(key, shared)
+
+    # Function to fetch the next chunk from the source for every reader
+    def _pull(self, key, shared):
+        chunk = error = None
+        try:
+            chunk = next(shared.source)
+        except StopIteration:
+            pass
+        except Exception as e:
+            error = e
+        # Finishing also unregisters the key, so no one joins a stream that has ended
+        with self._lock, shared.condition:
+            shared.pulling = False
+            if chunk is not None:
+                shared.chunks.append(chunk)
+            else:
+                shared.finished = True
+                shared.error = error
+                self._forget(key, shared)
+            shared.condition.notify_all()
+
+    # Call with self._lock held
+    def _forget(self, key, shared):
+        if self._streams.get(key) is shared:
+            del self._streams[key]
+
+    # Function to drop a reader; the last one out closes an unfinished source
+    def _leave(self, key, shared):
+        with self._lock, shared.condition:
+            shared.readers -= 1
+            abandoned = shared.readers == 0 and not shared.finished
+            if abandoned:
+                shared.finished = True
+                self._forget(key, shared)
+        if abandoned:
+            shared.source.close()